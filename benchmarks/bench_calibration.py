@@ -0,0 +1,83 @@
+"""Benchmark 3D LUT upload frame building: plain json.dumps vs the streaming data frame.
+
+Usage: python benchmarks/bench_calibration.py [--size 33] [--rounds 20]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from bscpylgtv import WebOsClient
+from bscpylgtv.frame_tools import build_data_frame
+from bscpylgtv.lut_tools import unity_lut_3d
+from bscpylgtv.mock_server import MockWebOsServer
+
+
+def plain_frame(message, data):
+    payload = {**message["payload"], "data": base64.b64encode(data.tobytes()).decode()}
+    return json.dumps({**message, "payload": payload})
+
+
+def stream_frame(message, data):
+    return build_data_frame(message, np.ascontiguousarray(data).reshape(-1))
+
+
+def measure(build, message, data, rounds):
+    """Return the mean time and the peak traced memory of building one frame."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        build(message, data)
+    elapsed = (time.perf_counter() - start) / rounds
+
+    tracemalloc.start()
+    build(message, data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+async def upload(size):
+    """Upload BT709 and BT2020 LUTs for three picture modes via the mock TV, print the stage stats."""
+    async with MockWebOsServer() as server:
+        client = await WebOsClient.create(
+            server.host, without_ssl=True, client_key=server.client_key, ping_interval=None, states=[],
+            calibration_info={"lut3d": f"{size}pt"}, stream_calibration=True,
+        )
+        client.port = server.port
+        await client.connect()
+        for picture_mode in ["expert1", "expert2", "cinema"]:
+            await client.start_calibration(picture_mode)
+            for name in ["upload_3d_lut_bt709", "upload_3d_lut_bt2020"]:
+                await getattr(client, name)()
+                stats = client.calibration_stats
+                print(
+                    f"{picture_mode:<8} {name:<22} encode {stats['encode']['bytes']:>8} B {stats['encode']['seconds'] * 1000:7.2f} ms"
+                    f"  request {stats['request']['bytes']:>8} B {stats['request']['seconds'] * 1000:7.2f} ms"
+                )
+            await client.end_calibration()
+        await client.disconnect()
+
+
+def main(args):
+    data = unity_lut_3d(args.size)
+    message = {"id": 1, "type": "request", "uri": "ssap://externalpq/setExternalPqData", "payload": {
+        "command": "BT709_3D_LUT_DATA", "profileNo": 0, "programID": 1,
+        "dataCount": data.size, "dataType": "unsigned integer16", "dataOpt": 1,
+    }}
+    print(f"{args.size}pt 3D LUT, {data.nbytes} bytes of raw data")
+    for name, build in [("json.dumps", plain_frame), ("streaming", stream_frame)]:
+        elapsed, peak = measure(build, message, data, args.rounds)
+        print(f"{name:<12} {elapsed * 1000:8.3f} ms/frame  peak {peak / 1024:8.1f} KiB")
+
+    asyncio.run(upload(args.size))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark 3D LUT upload frame building.")
+    parser.add_argument("--size", type=int, choices=[17, 33], default=33, help="3D LUT size")
+    parser.add_argument("--rounds", type=int, default=20, help="number of rounds")
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+"""Benchmark WebOsClient request round-trips against the local mock TV.
+
+Usage: python benchmarks/bench_client.py [--latency-ms 20] [--requests 500] [--concurrency 1]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bscpylgtv import WebOsClient
+from bscpylgtv import endpoints as ep
+from bscpylgtv.mock_server import MockWebOsServer
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100.0 * len(values)) - 1))
+    return values[index]
+
+
+async def create_client(server, **kwargs):
+    client = await WebOsClient.create(
+        server.host, without_ssl=True, client_key=server.client_key, ping_interval=None, **kwargs
+    )
+    client.port = server.port
+    return client
+
+
+async def bench_connect(server, rounds):
+    """Measure connect-to-ready time of connect_handler with the default states."""
+    durations = []
+    for _ in range(rounds):
+        client = await create_client(server)
+        start = time.perf_counter()
+        await client.connect()
+        durations.append(time.perf_counter() - start)
+        await client.disconnect()
+    return durations
+
+
+async def bench_requests(server, count, concurrency):
+    """Measure request latencies and throughput with a given number of concurrent callers."""
+    client = await create_client(server, states=[])
+    await client.connect()
+    latencies = []
+
+    async def worker(n):
+        for _ in range(n):
+            start = time.perf_counter()
+            await client.request(ep.GET_POWER_STATE)
+            latencies.append(time.perf_counter() - start)
+
+    per_worker = max(1, count // concurrency)
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(per_worker) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    await client.disconnect()
+    return latencies, elapsed
+
+
+def report(name, durations):
+    ms = [d * 1000.0 for d in durations]
+    print(
+        f"{name:<24} n={len(ms):<6} p50={percentile(ms, 50):8.3f} ms  p99={percentile(ms, 99):8.3f} ms"
+        f"  mean={statistics.mean(ms):8.3f} ms"
+    )
+
+
+async def main(args):
+    async with MockWebOsServer(latency=args.latency_ms / 1000.0) as server:
+        report("connect-to-ready", await bench_connect(server, args.connects))
+
+        latencies, elapsed = await bench_requests(server, args.requests, args.concurrency)
+        report("request", latencies)
+        print(f"{'throughput':<24} {len(latencies) / elapsed:10.1f} requests/sec (concurrency {args.concurrency})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark WebOsClient against a local mock TV.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="injected response latency")
+    parser.add_argument("--requests", type=int, default=1000, help="number of requests")
+    parser.add_argument("--concurrency", type=int, default=1, help="number of concurrent callers")
+    parser.add_argument("--connects", type=int, default=20, help="number of connect rounds")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,74 @@
+"""Benchmark the installed JSON codecs on representative SSAP payloads.
+
+Usage: python benchmarks/bench_codec.py [--rounds 200]
+"""
+import argparse
+import base64
+import time
+
+
+from bscpylgtv.codec import available_codecs, get_codec
+from bscpylgtv.lut_tools import unity_lut_3d
+
+
+def calibration_response():
+    """getExternalPqData response of a 33pt 3D LUT."""
+    data = unity_lut_3d(33)
+    return {"type": "response", "id": 12, "payload": {
+        "returnValue": True, "data": base64.b64encode(data.tobytes()).decode(),
+        "dataCount": int(data.size), "dataType": "unsigned integer16",
+    }}
+
+
+def launch_points(count=150):
+    """listLaunchPoints response with count apps."""
+    return {"type": "response", "id": 13, "payload": {"returnValue": True, "subscribed": True, "launchPoints": [
+        {
+            "id": f"com.example.app{i}", "title": f"App {i}", "removable": True, "systemApp": False,
+            "icon": f"http://127.0.0.1:3000/resources/{i:040x}/icon.png", "iconColor": "#1e1e1e",
+            "largeIcon": f"/mnt/otncabi/usr/palm/applications/com.example.app{i}/large.png",
+            "lptype": "default", "bgColor": "", "bgImage": "", "favicon": "", "launchPointId": f"com.example.app{i}_default",
+            "params": {}, "unmovable": False, "userData": "", "miniicon": "", "bgImages": [], "imageForRecents": "",
+        } for i in range(count)
+    ]}}
+
+
+def system_settings():
+    """getSystemSettings response of the picture category."""
+    keys = ["adjustingLuminance", "backlight", "blackLevel", "brightness", "color", "colorFilter", "colorGamut",
+            "colorManagementColorSystem", "colorManagementHueBlue", "colorTemperature", "contrast", "dynamicContrast",
+            "gamma", "hdrDynamicToneMapping", "localDimming", "mpegNoiseReduction", "noiseReduction", "peakBrightness",
+            "sharpness", "superResolution", "truMotionMode", "whiteBalanceBlue", "whiteBalanceCodeValue"]
+    return {"type": "response", "id": 14, "payload": {
+        "returnValue": True, "category": "picture", "settings": {key: "50" for key in keys},
+    }}
+
+
+def bench(func, arg, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(arg)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main(args):
+    payloads = {
+        "getExternalPqData": calibration_response(),
+        "listLaunchPoints": launch_points(),
+        "getSystemSettings": system_settings(),
+    }
+    for payload_name, msg in payloads.items():
+        frame = get_codec("json").dumps(msg)
+        print(f"{payload_name} ({len(frame) / 1024:.1f} KiB)")
+        for name in available_codecs():
+            codec = get_codec(name)
+            encoded = codec.dumps(msg)
+            dumps = bench(codec.dumps, msg, args.rounds)
+            loads = bench(codec.loads, frame, args.rounds)
+            print(f"  {name:<8} dumps {dumps:10.1f} us ({type(encoded).__name__:<5})  loads {loads:10.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the installed JSON codecs.")
+    parser.add_argument("--rounds", type=int, default=200, help="number of rounds")
+    main(parser.parse_args())
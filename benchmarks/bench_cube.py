@@ -0,0 +1,60 @@
+"""Benchmark read_cube_file on generated 17/33/65pt 3D LUT cube files.
+
+The genfromtxt column is the previous line based conversion of the same body, kept as reference.
+
+Usage: python benchmarks/bench_cube.py [--sizes 17 33 65] [--rounds 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from bscpylgtv.lut_tools import read_cube_file
+
+HEADER_LINES = 5
+
+
+def write_cube(path, size, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.random((size ** 3, 3))
+    with open(path, "w") as f:
+        f.write(f'# Created by bench_cube.py\nTITLE "random"\nLUT_3D_SIZE {size}\nDOMAIN_MIN 0.0 0.0 0.0\nDOMAIN_MAX 1.0 1.0 1.0\n\n')
+        np.savetxt(f, rows, fmt="%.6f")
+
+
+def genfromtxt_reference(path, size):
+    with open(path) as f:
+        lines = f.readlines()
+    lut = np.genfromtxt(lines[HEADER_LINES:], comments="#", dtype=np.float64)
+    lut = np.reshape(lut, (size, size, size, 3))
+    return np.clip(np.rint(lut * 4096.0).astype(np.uint16), 0, 4095)
+
+
+def timed(func, args, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func(*args)
+    return (time.perf_counter() - start) / rounds, result
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"{size}pt.cube")
+            write_cube(path, size)
+            fast, lut = timed(read_cube_file, (path,), args.rounds)
+            slow, reference = timed(genfromtxt_reference, (path, size), args.rounds)
+            assert np.array_equal(lut, reference)
+            print(
+                f"{size:>3}pt {os.path.getsize(path) / 1024:9.1f} KiB  read_cube_file {fast * 1000:9.2f} ms"
+                f"  genfromtxt {slow * 1000:9.2f} ms  speedup {slow / fast:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark read_cube_file.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[17, 33, 65], help="3D LUT sizes")
+    parser.add_argument("--rounds", type=int, default=5, help="number of rounds")
+    main(parser.parse_args())
@@ -0,0 +1,42 @@
+"""Benchmark serializing hot commands: codec.dumps of the message vs the FrameCache templates.
+
+Usage: python benchmarks/bench_frames.py [--rounds 100000]
+"""
+import argparse
+import time
+
+from bscpylgtv import endpoints as ep
+from bscpylgtv.codec import available_codecs, get_codec
+from bscpylgtv.frame_tools import FrameCache
+
+COMMANDS = {
+    "volume_up": (ep.VOLUME_UP, {}),
+    "set_itpg_patch_window": (ep.CALIBRATION, {
+        "command": "PATTERN_WINDOW", "fillR": 512, "fillG": 256, "fillB": 128, "winId": 0,
+        "width": 858, "height": 482, "startX": 1491, "startY": 839, "programID": 1,
+    }),
+}
+
+
+def bench(func, rounds):
+    start = time.perf_counter()
+    for uid in range(rounds):
+        func(uid)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main(args):
+    for command, (uri, payload) in COMMANDS.items():
+        print(command)
+        for name in available_codecs():
+            codec = get_codec(name)
+            cache = FrameCache(codec.dumps)
+            dumps = bench(lambda uid: codec.dumps({"id": uid, "type": "request", "uri": f"ssap://{uri}", "payload": payload}), args.rounds)
+            cached = bench(lambda uid: cache.frame("request", uri, payload, uid), args.rounds)
+            print(f"  {name:<8} dumps {dumps:6.2f} us  frame cache {cached:6.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark serializing hot commands.")
+    parser.add_argument("--rounds", type=int, default=100000, help="number of rounds")
+    main(parser.parse_args())
@@ -0,0 +1,92 @@
+"""Benchmark merging a generated defaultSettings.json dump: the previous merge_settings.py vs merge_default_settings.
+
+The previous script merged one category per run, it is run for the picture, aiPicture, option and other categories.
+
+Usage: python benchmarks/bench_merge_settings.py [--objects 20000] [--keys 40]
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+from json import JSONDecoder
+
+from bscpylgtv.settings_tools import merge_default_settings
+
+NOT_WHITESPACE = re.compile(r'[^\s]')
+CATEGORIES = ["picture$hdmi1.expert2", "picture$hdmi2.cinema", "aiPicture$hdmi1.expert2", "option", "other"]
+
+
+def generate_dump(objects, keys):
+    parts = []
+    for i in range(objects):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        if "$" in category:
+            category += f".2d.{i}"
+        value = {f"key{(i + k) % (keys * 4)}": str(k) for k in range(keys)}
+        parts.append(json.dumps({"category": category, "value": value}, indent=4))
+    return "\n".join(parts)
+
+
+def reference(path):
+    """The previous merge_settings.py, run once per category."""
+    def decode_stacked(document, pos=0, decoder=JSONDecoder()):
+        while True:
+            match = NOT_WHITESPACE.search(document, pos)
+            if not match:
+                return
+            obj, pos = decoder.raw_decode(document, match.start())
+            yield obj
+
+    result = {}
+    for category in ["picture", "aiPicture", "option", "other"]:
+        mergedData = {}
+        with open(path, 'r') as infile:
+            document = infile.read()
+        for obj in decode_stacked(document):
+            if obj['category'].startswith(category):
+                if category == 'picture' and not obj['category'].startswith('picture$hdmi1.expert2'):
+                    continue
+                mergedData = {**obj['value'], **mergedData}
+        result[category] = mergedData
+    return result
+
+
+def streaming(path):
+    with open(path) as f:
+        return merge_default_settings(f)
+
+
+def measure(func, path):
+    """Return the time, the peak traced memory and the result of func(path)."""
+    start = time.perf_counter()
+    result = func(path)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "defaultSettings-bench.json")
+        with open(path, "w") as f:
+            f.write(generate_dump(args.objects, args.keys))
+        print(f"{args.objects} objects, {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+        slow, slow_peak, expected = measure(reference, path)
+        fast, fast_peak, merged = measure(streaming, path)
+        assert merged == expected
+        print(f"merge_settings.py       {slow * 1000:9.1f} ms  peak {slow_peak / 1024:9.1f} KiB")
+        print(f"merge_default_settings  {fast * 1000:9.1f} ms  peak {fast_peak / 1024:9.1f} KiB  speedup {slow / fast:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark merging defaultSettings.json dumps.")
+    parser.add_argument("--objects", type=int, default=20000, help="number of objects in the dump")
+    parser.add_argument("--keys", type=int, default=40, help="number of keys per object")
+    main(parser.parse_args())
@@ -1,6 +1,7 @@
 from ._version import __version__, __version_info__
 from .exceptions import PyLGTVCmdException, PyLGTVPairException
 from .webos_client import StorageSqliteDict, WebOsClient
+from .fleet import WebOsFleet
 
 try:
     from .lut_tools import (
@@ -12,8 +13,11 @@ try:
         read_3by3_gamut_file,
         read_3dlut_file,
         backup_lut_into_file,
+        write_binary_lut_file,
+        read_binary_lut_file,
         unity_lut_1d,
         unity_lut_3d,
+        resample_lut_3d,
         convert_1dlut_to_cal_format,
     )
     lut_tools = True
@@ -28,6 +32,7 @@ __all__ = [
     "PyLGTVPairException",
     "StorageSqliteDict",
     "WebOsClient",
+    "WebOsFleet",
 ]
 
 if lut_tools:
@@ -40,7 +45,10 @@ if lut_tools:
         "read_3by3_gamut_file",
         "read_3dlut_file",
         "backup_lut_into_file",
+        "write_binary_lut_file",
+        "read_binary_lut_file",
         "unity_lut_1d",
         "unity_lut_3d",
+        "resample_lut_3d",
         "convert_1dlut_to_cal_format",
     ])
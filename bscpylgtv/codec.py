@@ -0,0 +1,99 @@
+import json
+
+from .exceptions import PyLGTVCmdException
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class JsonCodec:
+    """Serialize messages with the json module of the standard library."""
+    name = "json"
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """Serialize messages with orjson, frames are encoded into bytes."""
+    name = "orjson"
+
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class MsgspecCodec(JsonCodec):
+    """Serialize messages with msgspec, frames are encoded into bytes."""
+    name = "msgspec"
+
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj)
+
+    def loads(self, data):
+        return self._decoder.decode(data)
+
+
+class UjsonCodec(JsonCodec):
+    """Serialize messages with ujson."""
+    name = "ujson"
+
+    def dumps(self, obj):
+        return ujson.dumps(obj, escape_forward_slashes=False)
+
+    def loads(self, data):
+        return ujson.loads(data)
+
+
+# in order of preference
+CODECS = {
+    "orjson": (OrjsonCodec, orjson),
+    "msgspec": (MsgspecCodec, msgspec),
+    "ujson": (UjsonCodec, ujson),
+    "json": (JsonCodec, json),
+}
+
+
+def available_codecs():
+    """Return the names of the installed codecs in order of preference."""
+    return [name for name, (_, module) in CODECS.items() if module is not None]
+
+
+def get_codec(name=None):
+    """Return a codec instance by name, the standard library json if name is None, the fastest installed one if it's "auto".
+
+    The codecs aren't interchangeable for every payload: orjson and msgspec reject e.g. numpy
+    scalars (np.float64) and non-str dict keys which json.dumps accepts, so they are opt-in.
+    """
+    if name is None:
+        name = "json"
+    elif name == "auto":
+        name = available_codecs()[0]
+    if name not in CODECS:
+        raise PyLGTVCmdException(f"Invalid JSON codec {name}, must be auto or one of: {', '.join(CODECS)}.")
+
+    codec, module = CODECS[name]
+    if module is None:
+        raise PyLGTVCmdException(f"JSON codec {name} is not installed.")
+    return codec()
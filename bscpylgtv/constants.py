@@ -15,6 +15,30 @@ DV_CONFIG_TYPES = MappingProxyType({
     "2019": 2019,
 })
 
+# valid keys of get_system_settings per category (valid-settings.js of the apiadapter service)
+SYSTEM_SETTINGS_KEYS = MappingProxyType({
+    "twinTv": ("status", "role", "systemMode"),
+    "network": ("deviceName", "wolwowlOnOff", "bleAdvertisingOnOff"),
+    "option": (
+        "audioGuidance", "country", "zipcode", "livePlus", "firstTvSignalStatus", "addressInfo",
+        "phlCitySelection", "smartServiceCountryCode3", "syncMode", "storeMode", "localeCountryGroup",
+        "japanCitySelection", "countryBroadcastSystem", "yourMomentsVersion", "wallPaperSettings",
+    ),
+    "time": ("onTimerVolume", "timeZone"),
+    "picture": ("brightness", "backlight", "contrast", "color", "energySaving"),
+    "": ("eulaStatus", "eulaInfoNetwork", "mobileSetupStatus", "localeInfo"),
+    "other": ("simplinkEnable", "ueiEnable", "gameWallpaper"),
+    "sound": (
+        "avSync", "avSyncSpdif", "avSyncBypassInput", "eArcSupport", "soundOutput",
+        "soundOutputDigital", "soundMode", "tvSetupConfiguration",
+    ),
+    "lock": ("parentalGuidance", "ziggoRaiting"),
+    "general": (
+        "alwaysOn", "tvOnScreen", "tvInstallMethod", "powerOffBySCA3SystemChanged",
+        "SCA3SystemCountry", "homeAutoLaunch", "lifeOnScreenMode",
+    ),
+})
+
 if np:
     #  xr, yr, xg, yg, xb, yb, xw, yw
     BT2020_PRIMARIES = (0.708, 0.292, 0.170, 0.797, 0.131, 0.046, 0.3127, 0.3290)
@@ -17,3 +17,7 @@ class PyLGTVServiceNotFoundError(PyLGTVCmdError):
     def __init__(self, message):
         self.message = message
 
+
+class PyLGTVRequestTimeoutError(PyLGTVCmdException):
+    def __init__(self, message):
+        self.message = message
@@ -0,0 +1,140 @@
+import asyncio
+
+from .storage_proto import StorageProto
+from .storage_sqlitedict import StorageSqliteDict
+from .webos_client import WebOsClient, request_deadline
+from .exceptions import PyLGTVCmdException, PyLGTVRequestTimeoutError
+
+
+class WebOsFleet:
+    """Manage many TVs from one process.
+
+    All the clients share one SSL context and one key storage, the number of concurrent
+    connection attempts is bounded and clients are (re)connected lazily when a command is sent
+    to them. Commands are fanned out concurrently, so broadcasting to every TV takes roughly
+    the time of the slowest one.
+    """
+
+    def __init__(
+        self,
+        hosts,
+        key_file_path=None,
+        storage: StorageProto=None,
+        max_concurrent_connects=8,
+        timeout=None,
+        **client_kwargs,
+    ):
+        """Initialize the fleet, client_kwargs are passed to every WebOsClient."""
+        self.hosts = list(dict.fromkeys(hosts))
+        self.key_file_path = key_file_path
+        self.storage = storage
+        self.timeout = timeout
+        self.client_kwargs = client_kwargs
+        self.clients = {}
+        self._connect_semaphore = asyncio.Semaphore(max_concurrent_connects)
+        self._ssl_context = None
+        ssl_context = client_kwargs.pop("ssl_context", None)
+        if not client_kwargs.get("without_ssl", False):
+            self._ssl_context = ssl_context or WebOsClient.create_ssl_context()
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        fleet = cls(*args, **kwargs)
+        await fleet.async_init()
+        return fleet
+
+    async def async_init(self):
+        """Create the shared key storage and the clients."""
+        if self.storage is None:
+            self.storage = await StorageSqliteDict.create(self.key_file_path)
+        elif not isinstance(self.storage, StorageProto):
+            raise PyLGTVCmdException("Storage is not a StorageProto class.")
+
+        for host in self.hosts:
+            await self.add_host(host)
+
+    async def add_host(self, host):
+        """Create a client for host (if it doesn't exist yet) and return it."""
+        if host not in self.clients:
+            self.clients[host] = await WebOsClient.create(
+                host, storage=self.storage, ssl_context=self._ssl_context, **self.client_kwargs
+            )
+            if host not in self.hosts:
+                self.hosts.append(host)
+        return self.clients[host]
+
+    def __getitem__(self, host):
+        return self.clients[host]
+
+    def __len__(self):
+        return len(self.clients)
+
+    def _select(self, hosts):
+        if hosts is None:
+            return list(self.hosts)
+        unknown = [host for host in hosts if host not in self.clients]
+        if unknown:
+            raise PyLGTVCmdException(f"Unknown hosts {unknown}.")
+        return list(hosts)
+
+    async def _connected_client(self, host):
+        client = self.clients[host]
+        # is_connected() is already true during the handshake, connect() joins the attempt in progress
+        if client.connection is None:
+            async with self._connect_semaphore:
+                # a per-TV timeout mustn't cancel the connect_result shared with the other callers
+                await asyncio.shield(client.connect())
+        return client
+
+    async def _gather(self, hosts, coro_factory, timeout):
+        timeout = self.timeout if timeout is None else timeout
+
+        async def run(host):
+            if timeout is None:
+                return await coro_factory(host)
+            # the requests give up at the deadline themselves, wait_for also bounds connecting
+            with request_deadline(timeout):
+                try:
+                    return await asyncio.wait_for(coro_factory(host), timeout)
+                except asyncio.TimeoutError:
+                    raise PyLGTVRequestTimeoutError(f"{host} timed out after {timeout} seconds.") from None
+
+        results = await asyncio.gather(*[run(host) for host in hosts], return_exceptions=True)
+        return dict(zip(hosts, results))
+
+    async def connect(self, hosts=None, timeout=None):
+        """Connect the selected (by default all) TVs, return host -> True or exception."""
+        async def connect(host):
+            await self._connected_client(host)
+            return True
+
+        return await self._gather(self._select(hosts), connect, timeout)
+
+    async def disconnect(self, hosts=None):
+        """Disconnect the selected (by default all) TVs."""
+        selected = self._select(hosts)
+        await asyncio.gather(*[self.clients[host].disconnect() for host in selected], return_exceptions=True)
+
+    async def execute(self, command, *args, hosts=None, timeout=None, **kwargs):
+        """Call a WebOsClient method on the selected TVs concurrently.
+
+        Returns host -> result, failed calls are returned as exceptions, per-TV timeouts as PyLGTVRequestTimeoutError.
+        """
+        if not callable(getattr(WebOsClient, command, None)):
+            raise PyLGTVCmdException(f"Invalid command {command}.")
+
+        async def execute(host):
+            client = await self._connected_client(host)
+            return await getattr(client, command)(*args, **kwargs)
+
+        return await self._gather(self._select(hosts), execute, timeout)
+
+    def metrics(self):
+        """Return the ClientMetrics of the clients created with metrics enabled, e.g. for render_openmetrics."""
+        return [client.metrics for client in self.clients.values() if client.metrics is not None]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
@@ -0,0 +1,109 @@
+import binascii
+import json
+
+# multiple of 3, so only the last chunk is padded
+B64_CHUNK_SIZE = 3 * 16384
+
+
+def b64_length(size):
+    """Length of the base64 encoded form of size bytes."""
+    return (size + 2) // 3 * 4
+
+
+def b64encode_into(data, out, offset=0, chunk_size=B64_CHUNK_SIZE):
+    """Base64 encode a contiguous bytes-like object into the out buffer at offset, return the end offset.
+
+    Only one chunk is encoded at a time, so the temporary memory usage doesn't depend on the size of data.
+    """
+    chunk_size -= chunk_size % 3
+    view = memoryview(data).cast("B")
+    for start in range(0, len(view), chunk_size):
+        encoded = binascii.b2a_base64(view[start:start + chunk_size], newline=False)
+        out[offset:offset + len(encoded)] = encoded
+        offset += len(encoded)
+    return offset
+
+
+def build_data_frame(message, data, field="data"):
+    """Serialize message with data base64 encoded into its payload's field, return a bytearray.
+
+    The rest of the message is serialized as a template with an empty field as the last key of
+    the payload, the encoded data is written right into its place in the preallocated frame.
+    """
+    payload = {key: value for key, value in message.get("payload", {}).items() if key != field}
+    payload[field] = ""
+    message = {key: value for key, value in message.items() if key != "payload"}
+    message["payload"] = payload
+    template = json.dumps(message)
+    prefix, suffix = template[:-3].encode(), template[-3:].encode()
+
+    view = memoryview(data).cast("B")
+    frame = bytearray(len(prefix) + b64_length(len(view)) + len(suffix))
+    frame[:len(prefix)] = prefix
+    offset = b64encode_into(view, frame, len(prefix))
+    frame[offset:] = suffix
+    return frame
+
+
+FRAME_SLOT = "__bscpylgtv_slot__"
+# longer strings (e.g. base64 calibration data, texts) are one-off values not worth a template
+FRAME_CACHE_MAX_STR = 64
+FRAME_CACHE_SCALARS = (bool, float, type(None))
+
+
+class FrameCache:
+    """Cache of serialized request frames keyed by request type, uri and payload shape.
+
+    Integer payload values and the id are left open as %d slots of a bytes template,
+    the other values are part of the shape. Only payloads of small scalars are cached,
+    ones with longer strings or containers (lists, dicts, tuples) are serialized as usual.
+    A cached command is serialized with a single bytes formatting.
+    """
+
+    def __init__(self, dumps, maxsize=256, max_str=FRAME_CACHE_MAX_STR):
+        self.dumps = dumps
+        self.maxsize = maxsize
+        self.max_str = max_str
+        self.templates = {}
+
+    def __len__(self):
+        return len(self.templates)
+
+    def clear(self):
+        self.templates.clear()
+
+    def frame(self, request_type, uri, payload, uid):
+        """Return the serialized frame as bytes, None if the payload can't be cached."""
+        values = [uid]
+        shape = []
+        for key, value in payload.items():
+            kind = type(value)
+            if kind is int:
+                values.append(value)
+                shape.append(key)
+            elif kind in FRAME_CACHE_SCALARS or (kind is str and len(value) <= self.max_str):
+                # True == 1.0 and False == 0.0, the type keeps their templates apart
+                shape.append((key, kind, value))
+            else:
+                return None
+        key = (request_type, uri, tuple(shape))
+
+        template = self.templates.get(key)
+        if template is None:
+            if len(self.templates) >= self.maxsize:
+                del self.templates[next(iter(self.templates))]
+            template = self.templates[key] = self.build_template(request_type, uri, payload)
+
+        return template % tuple(values)
+
+    def build_template(self, request_type, uri, payload):
+        message = {
+            "id": FRAME_SLOT,
+            "type": request_type,
+            "uri": f"ssap://{uri}",
+            "payload": {key: FRAME_SLOT if type(value) is int else value for key, value in payload.items()},
+        }
+        template = self.dumps(message)
+        if not isinstance(template, str):
+            template = bytes(template).decode()
+        return template.replace("%", "%%").replace(f'"{FRAME_SLOT}"', "%d").encode()
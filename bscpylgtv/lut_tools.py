@@ -4,9 +4,42 @@ except ImportError:
     np = None
 
 if np:
+    import json
+    import re
+    import warnings
     from datetime import date
     from .constants import BT2020_PRIMARIES, DV_PICTURE_MODES, DV_BLACK_LEVEL, DV_GAMMA, LUT1D_POINTS
 
+    BINARY_LUT_MAGIC = b"BLUT"
+    BINARY_LUT_ALIGN = 64
+    CALIBRATION_SNAPSHOT_VERSION = 1
+
+
+    def _read_cube_body(body):
+        """Convert the numeric rows of a cube file, falls back to genfromtxt for anything unusual."""
+        if b"#" in body:
+            body = re.sub(rb"#[^\n]*", b"", body)
+
+        with warnings.catch_warnings():
+            # fromstring warns if it can't read the string to its end
+            warnings.simplefilter("error", DeprecationWarning)
+            try:
+                values = np.fromstring(body, dtype=np.float64, sep=" ")
+            except (DeprecationWarning, ValueError):
+                values = None
+
+        # fromstring ignores the line breaks, the values must fill exactly 3 per non-empty line,
+        # e.g. rows of 6 values are left to genfromtxt (whitespace only lines are too)
+        if values is not None:
+            lines = body.split(b"\n")
+            if values.size != 3 * (len(lines) - lines.count(b"")):
+                values = None
+
+        if values is None:
+            return np.genfromtxt(body.decode().splitlines(), comments="#", dtype=np.float64)
+
+        return values.reshape(-1, 3)
+
 
     def unity_lut_1d():
         lutmono = np.linspace(0.0, 32767.0, 1024, dtype=np.float64)
@@ -26,16 +59,67 @@ if np:
         return lut
 
 
-    def read_cube_file(filename):  # noqa: C901
-        nheader = 0
+    def resample_lut_3d(lut, size, method="tetrahedral"):
+        """Resample a (n, n, n, 3) shaped float 3D LUT to (size, size, size, 3).
+
+        Supported interpolation methods are tetrahedral and trilinear.
+        """
+        if method not in ("tetrahedral", "trilinear"):
+            raise ValueError(f"Invalid interpolation method {method}, must be tetrahedral or trilinear.")
+        n = lut.shape[0]
+        if lut.ndim != 4 or lut.shape != (n, n, n, 3) or n < 2:
+            raise ValueError(f"Invalid 3D LUT shape {lut.shape}.")
+        if size < 2:
+            raise ValueError(f"Invalid 3D LUT size {size}, must be at least 2.")
+
+        # position of the target grid points on the source grid, per axis
+        pos = np.linspace(0.0, n - 1, size)
+        base = np.minimum(np.floor(pos).astype(np.intp), n - 2)
+        frac = pos - base
+
+        grid = np.stack(np.meshgrid(base, base, base, indexing="ij"), axis=-1).reshape(-1, 3)
+        f = np.stack(np.meshgrid(frac, frac, frac, indexing="ij"), axis=-1).reshape(-1, 3)
+
+        def corners(offset):
+            idx = grid + offset
+            return lut[idx[:, 0], idx[:, 1], idx[:, 2]]
+
+        if method == "trilinear":
+            out = np.zeros((grid.shape[0], 3), dtype=np.float64)
+            for corner in np.ndindex(2, 2, 2):
+                corner = np.array(corner)
+                weight = np.prod(np.where(corner == 1, f, 1.0 - f), axis=1)
+                out += weight[:, None] * corners(corner)
+        else:
+            # walk from the base corner to the opposite one along the axes in descending order of fractions
+            order = np.argsort(-f, axis=1, kind="stable")
+            fs = np.take_along_axis(f, order, axis=1)
+            rows = np.arange(grid.shape[0])
+            step1 = np.zeros_like(grid)
+            step1[rows, order[:, 0]] = 1
+            step2 = step1.copy()
+            step2[rows, order[:, 1]] = 1
+
+            out = (1.0 - fs[:, 0])[:, None] * corners(0)
+            out += (fs[:, 0] - fs[:, 1])[:, None] * corners(step1)
+            out += (fs[:, 1] - fs[:, 2])[:, None] * corners(step2)
+            out += fs[:, 2][:, None] * corners(1)
+
+        return out.reshape(size, size, size, 3)
+
+
+    def read_cube_file(filename, lut3d_size=None):
+        """Read a 1D or 3D LUT cube file, 3D LUTs are resampled to lut3d_size if it's specified and differs."""
+        with open(filename, "rb") as f:
+            return _parse_cube(f, lut3d_size)
+
+
+    def _parse_cube(f, resample_size=None):  # noqa: C901
         lut_1d_size = None
         lut_3d_size = None
         domain_min = None
         domain_max = None
 
-        with open(filename) as f:
-            lines = f.readlines()
-
         def domain_check(line, which):
             domain_limit = np.genfromtxt([line], usecols=(1, 2, 3), dtype=np.float64)
             if domain_limit.shape != (3,):
@@ -56,7 +140,18 @@ if np:
                 )
             return lut_size
 
-        for line in lines:
+        # read the file at once, parse the header line by line, then convert the body at once
+        data = f.read()
+        if b"\r" in data:
+            # universal newlines, CRLF and CR-only files are read like LF ones
+            data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+        offset = 0
+        while offset < len(data):
+            end = data.find(b"\n", offset)
+            end = len(data) if end < 0 else end + 1
+            line = data[offset:end].decode()
+
             icomment = line.find("#")
             if icomment >= 0:
                 line = line[:icomment]
@@ -81,8 +176,7 @@ if np:
                 domain_max = domain_check(line, "MAX")
             else:
                 break
-
-            nheader += 1
+            offset = end
 
         if lut_1d_size and lut_3d_size:
             raise ValueError("Cannot specify both LUT_1D_SIZE and LUT_3D_SIZE.")
@@ -96,28 +190,31 @@ if np:
         if domain_max is None:
             domain_max = np.ones((1, 3), dtype=np.float64)
 
-        lut = np.genfromtxt(lines[nheader:], comments="#", dtype=np.float64)
+        lut = _read_cube_body(data[offset:])
         if np.amin(lut) < -1e37 or np.amax(lut) > 1e37:
             raise ValueError("Invalid value in DOMAIN_MAX, must be in range [-1e37,1e37].")
 
+        if lut_1d_size and lut.shape != (lut_1d_size, 3):
+            raise ValueError(
+                f"Expected shape {(lut_1d_size, 3)} for 1D LUT, but got {lut.shape}."
+            )
+        if lut_3d_size and lut.shape != (lut_3d_size ** 3, 3):
+            raise ValueError(
+                f"Expected shape {(lut_3d_size**3, 3)} for 3D LUT, but got {lut.shape}."
+            )
+
         # shift and scale lut to range [0.,1.]
         lut = (lut - domain_min) / (domain_max - domain_min)
 
         if lut_1d_size:
-            if lut.shape != (lut_1d_size, 3):
-                raise ValueError(
-                    f"Expected shape {(lut_1d_size, 3)} for 1D LUT, but got {lut.shape}."
-                )
             # convert to integer with appropriate range
             lut = np.rint(lut * 32767.0).astype(np.uint16)
             # transpose to get the correct element order
             lut = np.transpose(lut)
         elif lut_3d_size:
-            if lut.shape != (lut_3d_size ** 3, 3):
-                raise ValueError(
-                    f"Expected shape {(lut_3d_size**3, 3)} for 3D LUT, but got {lut.shape}."
-                )
             lut = np.reshape(lut, (lut_3d_size, lut_3d_size, lut_3d_size, 3))
+            if resample_size and resample_size != lut_3d_size:
+                lut = resample_lut_3d(lut, resample_size)
             lut = np.rint(lut * 4096.0).astype(np.uint16)
             lut = np.clip(lut, 0, 4095)
         return lut
@@ -213,6 +310,77 @@ if np:
         return lut
 
 
+    def write_binary_lut_file(filename, data, chip_type=None, picture_mode=None):
+        """Write data into a binary LUT (blut) file.
+
+        Layout: magic, header length (uint32), JSON header (shape, dtype, chip type, picture mode)
+        padded to 64 bytes, then the raw little-endian data.
+        """
+        data = np.ascontiguousarray(data, dtype=data.dtype.newbyteorder("<"))
+        header = {
+            "version": 1,
+            "shape": list(data.shape),
+            "dtype": data.dtype.str,
+            "chip_type": chip_type,
+            "picture_mode": picture_mode,
+        }
+        header = json.dumps(header).encode()
+        header += b" " * (-(len(BINARY_LUT_MAGIC) + 4 + len(header)) % BINARY_LUT_ALIGN)
+
+        with open(filename, "wb") as f:
+            f.write(BINARY_LUT_MAGIC)
+            f.write(len(header).to_bytes(4, "little"))
+            f.write(header)
+            data.tofile(f)
+
+        return True
+
+
+    def read_binary_lut_header(filename):
+        with open(filename, "rb") as f:
+            if f.read(len(BINARY_LUT_MAGIC)) != BINARY_LUT_MAGIC:
+                raise ValueError(f"Invalid binary LUT file {filename}.")
+            length = int.from_bytes(f.read(4), "little")
+            header = json.loads(f.read(length))
+
+        header["offset"] = len(BINARY_LUT_MAGIC) + 4 + length
+        return header
+
+
+    def read_binary_lut_file(filename, shape=None, dtype=None):
+        """Memory-map the data of a binary LUT file, shape and dtype are validated if they're specified."""
+        header = read_binary_lut_header(filename)
+        lut_shape = tuple(header["shape"])
+        lut_dtype = np.dtype(header["dtype"])
+
+        if shape is not None and lut_shape != shape:
+            raise ValueError(f"LUT should have shape {shape} but instead has {lut_shape}")
+        if dtype is not None and lut_dtype != dtype:
+            raise TypeError(f"numpy dtype should be {dtype} but is instead {lut_dtype}")
+
+        return np.memmap(filename, dtype=lut_dtype, mode="r", offset=header["offset"], shape=lut_shape)
+
+
+    def write_calibration_snapshot(filename, data, metadata):
+        """Write calibration data (name -> array) and metadata into a npz archive."""
+        metadata = {**metadata, "version": CALIBRATION_SNAPSHOT_VERSION}
+        np.savez(filename, metadata=np.array(json.dumps(metadata)), **data)
+        return True
+
+
+    def read_calibration_snapshot(filename):
+        """Read a calibration snapshot archive, return the data (name -> array) and the metadata."""
+        with np.load(filename, allow_pickle=False) as archive:
+            if "metadata" not in archive.files:
+                raise ValueError(f"Invalid calibration snapshot {filename}.")
+            metadata = json.loads(str(archive["metadata"]))
+            if metadata.get("version", 0) > CALIBRATION_SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported calibration snapshot version {metadata.get('version')}.")
+            data = {name: archive[name] for name in archive.files if name != "metadata"}
+
+        return data, metadata
+
+
     def lms2rgb_matrix(primaries=BT2020_PRIMARIES):
         xy = np.array(primaries, dtype=np.float64)
 
@@ -0,0 +1,264 @@
+import asyncio
+import socket
+import time
+from bisect import bisect_left
+
+# upper bounds in seconds, the last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, as exported to Prometheus."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Return (upper bound, cumulative count) pairs, the last bound is inf."""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class UriMetrics:
+    """Counters of one SSAP uri."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.requests = 0
+        self.responses = 0
+        self.errors = {}
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.messages = 0
+        self.latency = Histogram(buckets)
+
+
+class ClientMetrics:
+    """Wire level metrics of a WebOsClient.
+
+    Requests are counted per uri with their latency histogram, bytes sent and received and errors
+    by kind: the code of error responses (e.g. "404"), "failed" (returnValue false), "timeout"
+    or "cancelled" (connection closed meanwhile). Subscription messages are counted separately.
+    Every observation is also forwarded to the sink (e.g. StatsdSink) if it's set.
+    """
+
+    def __init__(self, labels=None, sink=None, buckets=LATENCY_BUCKETS):
+        self.labels = dict(labels or {})
+        self.sink = sink
+        self.buckets = buckets
+        self.uris = {}
+        self.ping = Histogram(buckets)
+        self.connect = Histogram(buckets)
+        self.reconnects = 0
+        self.started = time.time()
+
+    def uri(self, uri):
+        metrics = self.uris.get(uri)
+        if metrics is None:
+            metrics = self.uris[uri] = UriMetrics(self.buckets)
+        return metrics
+
+    def request_sent(self, uri, size):
+        metrics = self.uri(uri)
+        metrics.requests += 1
+        metrics.bytes_out += size
+        if self.sink is not None:
+            self.sink.incr("requests", 1, self.labels, uri)
+
+    def response_received(self, uri, seconds, size, error=None):
+        metrics = self.uri(uri)
+        metrics.responses += 1
+        metrics.bytes_in += size
+        metrics.latency.observe(seconds)
+        if self.sink is not None:
+            self.sink.timing("request", seconds, self.labels, uri)
+        if error is not None:
+            self.request_failed(uri, error)
+
+    def request_failed(self, uri, error):
+        errors = self.uri(uri).errors
+        errors[error] = errors.get(error, 0) + 1
+        if self.sink is not None:
+            self.sink.incr(f"errors.{error}", 1, self.labels, uri)
+
+    def subscription_message(self, uri, size):
+        metrics = self.uri(uri)
+        metrics.messages += 1
+        metrics.bytes_in += size
+        if self.sink is not None:
+            self.sink.incr("messages", 1, self.labels, uri)
+
+    def ping_rtt(self, seconds):
+        self.ping.observe(seconds)
+        if self.sink is not None:
+            self.sink.timing("ping", seconds, self.labels)
+
+    def connected(self, seconds):
+        self.connect.observe(seconds)
+        if self.sink is not None:
+            self.sink.timing("connect", seconds, self.labels)
+
+    def reconnected(self):
+        self.reconnects += 1
+        if self.sink is not None:
+            self.sink.incr("reconnects", 1, self.labels)
+
+    def message_rates(self):
+        """Return uri -> subscription messages per second since the metrics were created."""
+        elapsed = max(time.time() - self.started, 1e-9)
+        return {uri: metrics.messages / elapsed for uri, metrics in self.uris.items() if metrics.messages}
+
+
+class StatsdSink:
+    """Send the observations to a statsd server over UDP, e.g. bscpylgtv.192_168_1_18.request.audio_getVolume:12.5|ms
+
+    With tags=True the labels and the uri are sent as DogStatsD tags instead of being part of the name.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8125, prefix="bscpylgtv", tags=False):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.tags = tags
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    @staticmethod
+    def _sanitize(value):
+        return "".join(c if c.isalnum() or c in "-_" else "_" for c in str(value))
+
+    def _line(self, name, value, kind, labels, uri):
+        if self.tags:
+            tags = [f"{key}:{value}" for key, value in labels.items()]
+            if uri is not None:
+                tags.append(f"uri:{uri}")
+            suffix = f"|#{','.join(tags)}" if tags else ""
+            return f"{self.prefix}.{name}:{value}|{kind}{suffix}"
+
+        parts = [self.prefix] + [self._sanitize(value) for value in labels.values()] + [name]
+        if uri is not None:
+            parts.append(self._sanitize(uri))
+        return f"{'.'.join(parts)}:{value}|{kind}"
+
+    def send(self, line):
+        try:
+            self.socket.sendto(line.encode(), self.address)
+        except OSError:
+            # metrics are best effort, a full buffer or an unreachable server is ignored
+            pass
+
+    def incr(self, name, value=1, labels=None, uri=None):
+        self.send(self._line(name, value, "c", labels or {}, uri))
+
+    def timing(self, name, seconds, labels=None, uri=None):
+        self.send(self._line(name, round(seconds * 1000, 3), "ms", labels or {}, uri))
+
+    def close(self):
+        self.socket.close()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _histogram(lines, name, histogram, labels):
+    for bound, count in histogram.cumulative():
+        le = "+Inf" if bound == float("inf") else repr(float(bound))
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {count}")
+    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+
+
+def render_openmetrics(metrics):
+    """Render ClientMetrics (one or an iterable of them) in the OpenMetrics text format."""
+    if isinstance(metrics, ClientMetrics):
+        metrics = [metrics]
+    metrics = list(metrics)
+
+    families = [
+        ("requests", "counter", "Requests sent", lambda m: m.requests),
+        ("responses", "counter", "Responses received", lambda m: m.responses),
+        ("sent_bytes", "counter", "Bytes of the sent requests", lambda m: m.bytes_out),
+        ("received_bytes", "counter", "Bytes of the received responses and subscription messages", lambda m: m.bytes_in),
+        ("subscription_messages", "counter", "Subscription messages received", lambda m: m.messages),
+    ]
+
+    lines = []
+    for name, kind, help_text, value in families:
+        lines.append(f"# TYPE bscpylgtv_{name} {kind}")
+        lines.append(f"# HELP bscpylgtv_{name} {help_text}.")
+        for client in metrics:
+            for uri, uri_metrics in client.uris.items():
+                lines.append(f"bscpylgtv_{name}_total{_labels({**client.labels, 'uri': uri})} {value(uri_metrics)}")
+
+    lines.append("# TYPE bscpylgtv_request_errors counter")
+    lines.append("# HELP bscpylgtv_request_errors Failed requests by error kind.")
+    for client in metrics:
+        for uri, uri_metrics in client.uris.items():
+            for error, count in uri_metrics.errors.items():
+                lines.append(f"bscpylgtv_request_errors_total{_labels({**client.labels, 'uri': uri, 'error': error})} {count}")
+
+    lines.append("# TYPE bscpylgtv_request_duration_seconds histogram")
+    lines.append("# HELP bscpylgtv_request_duration_seconds Time from sending a request to its response.")
+    for client in metrics:
+        for uri, uri_metrics in client.uris.items():
+            if uri_metrics.latency.count:
+                _histogram(lines, "bscpylgtv_request_duration_seconds", uri_metrics.latency, {**client.labels, "uri": uri})
+
+    for name, help_text, attr in [
+        ("ping_rtt_seconds", "Round-trip time of the websocket pings.", "ping"),
+        ("connect_seconds", "Time from opening the connection to being ready.", "connect"),
+    ]:
+        lines.append(f"# TYPE bscpylgtv_{name} histogram")
+        lines.append(f"# HELP bscpylgtv_{name} {help_text}")
+        for client in metrics:
+            _histogram(lines, f"bscpylgtv_{name}", getattr(client, attr), client.labels)
+
+    lines.append("# TYPE bscpylgtv_reconnects counter")
+    lines.append("# HELP bscpylgtv_reconnects Successful automatic reconnects.")
+    for client in metrics:
+        lines.append(f"bscpylgtv_reconnects_total{_labels(client.labels)} {client.reconnects}")
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+async def start_openmetrics_server(metrics, host="0.0.0.0", port=9464):
+    """Serve render_openmetrics over HTTP for Prometheus, metrics can also be a callable returning them.
+
+    Returns the asyncio server, every request path gets the same response.
+    """
+    async def handle(reader, writer):
+        try:
+            # the request itself doesn't matter, read until the end of the headers
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            body = render_openmetrics(metrics() if callable(metrics) else metrics).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/openmetrics-text; version=1.0.0; charset=utf-8\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
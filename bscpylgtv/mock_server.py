@@ -0,0 +1,281 @@
+import asyncio
+import fnmatch
+import itertools
+import json
+
+import websockets
+
+from . import endpoints as ep
+
+SSAP_PREFIX = "ssap://"
+
+DEFAULT_RESPONSES = {
+    ep.GET_SYSTEM_INFO: {
+        "features": {"3d": False, "dvr": True},
+        "receiverType": "dvb",
+        "modelName": "OLED65C3",
+    },
+    ep.GET_SOFTWARE_INFO: {
+        "product_name": "webOSTV 23",
+        "model_name": "HE_DTV_W23O_AFABATAA",
+        "sw_type": "FIRMWARE",
+        "major_ver": "03",
+        "minor_ver": "30.65",
+        "country": "HU",
+        "device_id": "00:00:00:00:00:00",
+    },
+    ep.GET_POWER_STATE: {"state": "Active"},
+    ep.GET_CURRENT_APP_INFO: {"appId": "com.webos.app.hdmi1"},
+    ep.GET_AUDIO_STATUS: {"mute": False, "volume": 10},
+    ep.GET_VOLUME: {"volumeStatus": {"volume": 10, "muteStatus": False, "soundOutput": "tv_speaker"}},
+    ep.GET_APPS: {
+        "launchPoints": [
+            {"id": "com.webos.app.hdmi1", "title": "HDMI 1"},
+            {"id": "com.webos.app.hdmi2", "title": "HDMI 2"},
+            {"id": "netflix", "title": "Netflix"},
+        ],
+    },
+    ep.GET_INPUTS: {
+        "devices": [
+            {"id": "HDMI_1", "label": "HDMI 1", "appId": "com.webos.app.hdmi1"},
+            {"id": "HDMI_2", "label": "HDMI 2", "appId": "com.webos.app.hdmi2"},
+        ],
+    },
+    ep.GET_SOUND_OUTPUT: {"soundOutput": "tv_speaker"},
+    ep.GET_TV_CHANNELS: {"channelList": []},
+}
+
+DEFAULT_SETTINGS = {
+    "picture": {"backlight": "80", "brightness": "50", "color": "50", "contrast": "85"},
+    "option": {"audioGuidance": "off"},
+}
+
+
+class MockWebOsServer:
+    """Local websockets based stand-in for a webOS TV speaking the SSAP protocol.
+
+    It performs the hello and register handshake, answers arbitrary ssap:// URIs with scripted
+    payloads (either dicts or callables receiving the request message), keeps track of
+    subscriptions so payloads can be pushed to them and can inject latency into every response.
+    It's meant for unit tests and benchmarks, connect to it with `without_ssl=True`:
+
+        server = await MockWebOsServer.create(latency=0.02)
+        client = await WebOsClient.create(server.host, without_ssl=True, client_key=server.client_key)
+        client.port = server.port
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=0,
+        responses=None,
+        settings=None,
+        client_key="mock-client-key",
+        hello_info=None,
+        strict=False,
+    ):
+        """Initialize the server, latency is in seconds (or a callable returning it for an uri)."""
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.responses = {**DEFAULT_RESPONSES, **(responses or {})}
+        self.settings = {category: dict(values) for category, values in (settings or DEFAULT_SETTINGS).items()}
+        self.configs = {}
+        self.calibration_data = {}
+        self.client_key = client_key
+        self.hello_info = hello_info or {"protocolVersion": 1, "deviceType": "tv", "deviceUUID": "mock-device-uuid"}
+        self.strict = strict
+        self.errors = {}
+        self.ignored_uris = set()
+        self.received = []
+        self.calibration_requests = []
+        self.input_messages = []
+        self.connections = set()
+        self.subscriptions = {}
+        self.input_port = None
+        self._server = None
+        self._input_server = None
+        self._alert_ids = itertools.count()
+        self.alerts = {}
+        self.luna_calls = []
+        self._tasks = set()
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        server = cls(*args, **kwargs)
+        await server.start()
+        return server
+
+    async def start(self):
+        self._server = await websockets.serve(self._handler, self.host, self.port, max_size=None)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._input_server = await websockets.serve(self._input_handler, self.host, 0)
+        self.input_port = self._input_server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for server in (self._server, self._input_server):
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+        self._server = None
+        self._input_server = None
+
+    async def __aenter__(self):
+        if self._server is None:
+            await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    def set_error(self, uri, error="404 no such service or method"):
+        """Answer requests of uri with an error response."""
+        self.errors[uri] = error
+
+    def set_calibration_data(self, command, data, data_count, data_type="unsigned integer16"):
+        """Set the base64 encoded data returned by the getExternalPqData endpoint for command."""
+        self.calibration_data[command] = {"data": data, "dataCount": data_count, "dataType": data_type}
+
+    def requests_for(self, uri):
+        """Return the received request messages of uri."""
+        return [msg for msg in self.received if msg.get("uri") == f"{SSAP_PREFIX}{uri}"]
+
+    async def push(self, uri, payload):
+        """Push a payload to all the subscribers of uri."""
+        sends = []
+        for ws, uid in self.subscriptions.get(uri, []):
+            msg = {"type": "response", "id": uid, "payload": {"returnValue": True, "subscribed": True, **payload}}
+            sends.append(self._send(ws, msg))
+        if sends:
+            await asyncio.gather(*sends, return_exceptions=True)
+
+    async def disconnect_clients(self):
+        """Drop all the client connections, e.g. to simulate a network failure."""
+        if self.connections:
+            await asyncio.gather(*[ws.close() for ws in list(self.connections)], return_exceptions=True)
+
+    async def _handler(self, ws, path=None):
+        self.connections.add(ws)
+        try:
+            async for raw_msg in ws:
+                msg = json.loads(raw_msg)
+                self.received.append(msg)
+                msg_type = msg.get("type")
+
+                if msg_type == "hello":
+                    await self._send(ws, {"type": "hello", "id": msg.get("id"), "payload": self.hello_info})
+                elif msg_type == "register":
+                    await self._register(ws, msg)
+                else:
+                    task = asyncio.create_task(self._respond(ws, msg))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.connections.discard(ws)
+            for subscribers in self.subscriptions.values():
+                subscribers[:] = [item for item in subscribers if item[0] is not ws]
+
+    async def _input_handler(self, ws, path=None):
+        try:
+            async for raw_msg in ws:
+                self.input_messages.append(raw_msg)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def _register(self, ws, msg):
+        uid = msg.get("id")
+        if msg.get("payload", {}).get("client-key") != self.client_key:
+            await self._send(ws, {"type": "response", "id": uid, "payload": {"pairingType": "PROMPT", "returnValue": True}})
+        await self._send(ws, {"type": "registered", "id": uid, "payload": {"client-key": self.client_key}})
+
+    async def _respond(self, ws, msg):
+        uid = msg.get("id")
+        uri = msg.get("uri", "")
+        if uri.startswith(SSAP_PREFIX):
+            uri = uri[len(SSAP_PREFIX):]
+
+        if uri in self.ignored_uris:
+            return
+
+        latency = self.latency(uri) if callable(self.latency) else self.latency
+        if latency:
+            await asyncio.sleep(latency)
+
+        if uri in self.errors:
+            await self._send(ws, {"type": "error", "id": uid, "error": self.errors[uri], "payload": {}})
+            return
+
+        payload = self._payload(uri, msg)
+        if payload is None:
+            if self.strict:
+                await self._send(ws, {"type": "error", "id": uid, "error": "404 no such service or method", "payload": {}})
+            else:
+                await self._send(ws, {"type": "response", "id": uid, "payload": {"returnValue": True}})
+            return
+
+        payload = {"returnValue": True, **payload}
+        if msg.get("type") == "subscribe":
+            payload["subscribed"] = True
+            self.subscriptions.setdefault(uri, []).append((ws, uid))
+
+        await self._send(ws, {"type": "response", "id": uid, "payload": payload})
+
+    def _payload(self, uri, msg):
+        payload = msg.get("payload") or {}
+        response = self.responses.get(uri)
+        if callable(response):
+            return response(msg)
+        elif response is not None:
+            return response
+
+        if uri == ep.GET_SYSTEM_SETTINGS:
+            category = payload.get("category")
+            values = self.settings.get(category, {})
+            return {"category": category, "settings": {k: values[k] for k in payload.get("keys", []) if k in values}}
+        elif uri == ep.GET_CONFIGS:
+            names = payload.get("configNames", [])
+            return {"configs": {k: v for k, v in self.configs.items() if any(fnmatch.fnmatch(k, n) for n in names)}}
+        elif uri == ep.INPUT_SOCKET:
+            return {"socketPath": f"ws://{self.host}:{self.input_port}/"}
+        elif uri == ep.CREATE_ALERT:
+            alert_id = f"com.webos.service.apiadapter-{next(self._alert_ids)}"
+            self.alerts[alert_id] = payload.get("onclose")
+            return {"alertId": alert_id}
+        elif uri == ep.CLOSE_ALERT:
+            onclose = self.alerts.pop(payload.get("alertId"), None)
+            if onclose is not None:
+                self._luna(onclose.get("uri", ""), onclose.get("params", {}))
+            return {}
+        elif uri == ep.CALIBRATION:
+            self.calibration_requests.append(payload)
+            return {}
+        elif uri == ep.GET_CALIBRATION:
+            data = self.calibration_data.get(payload.get("command"))
+            return data if data is not None else {"returnValue": False}
+
+        return None
+
+    def _luna(self, uri, params):
+        """Apply the luna call of a closed alert, settings and configs are stored."""
+        if uri.startswith("luna://"):
+            uri = uri[len("luna://"):]
+        self.luna_calls.append((uri, params))
+        if uri == ep.LUNA_SET_SYSTEM_SETTINGS:
+            self.settings.setdefault(params.get("category"), {}).update(params.get("settings", {}))
+        elif uri == ep.LUNA_SET_CONFIGS:
+            self.configs.update(params.get("configs", {}))
+
+    async def _send(self, ws, msg):
+        try:
+            await ws.send(json.dumps(msg))
+        except websockets.exceptions.ConnectionClosed:
+            pass
@@ -0,0 +1,96 @@
+import json
+import os
+import re
+
+NOT_WHITESPACE = re.compile(r"[^\s]")
+
+# only the settings of this input and preset are merged per category, the rest are variations of them
+CATEGORY_FILTERS = {"picture": "picture$hdmi1.expert2"}
+
+
+def iter_stacked_json(fp, chunk_size=1 << 16):
+    """Yield the concatenated JSON documents of a text file object one by one.
+
+    The file is read in chunks of chunk_size characters, only the current (partial)
+    document is kept in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    while True:
+        match = NOT_WHITESPACE.search(buffer, pos)
+        if match is None:
+            if eof:
+                return
+            buffer = fp.read(chunk_size)
+            pos = 0
+            eof = not buffer
+            continue
+
+        pos = match.start()
+        try:
+            obj, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = None
+        # a document ending at the end of the buffer (e.g. a number) may continue in the next chunk,
+        # the buffer grows geometrically so a big document isn't decoded again for every chunk
+        if end is None or (end == len(buffer) and not eof):
+            chunk = fp.read(max(chunk_size, len(buffer) - pos))
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            eof = not chunk
+            continue
+
+        pos = end
+        yield obj
+
+
+def merge_default_settings(fp, categories=None, filters=CATEGORY_FILTERS, chunk_size=1 << 16):
+    """Merge the values of a defaultSettings.json dump per category in one pass.
+
+    Every object of the dump is like {"category": "picture$hdmi1.expert2.2d.sdr", "value": {...}},
+    its category is the part before "$". For every category the first value of a key wins,
+    categories in filters only merge the objects whose full category starts with the filter.
+    categories limits the merged categories, all of them are merged by default.
+    Returns category -> merged settings.
+    """
+    merged = {}
+    for obj in iter_stacked_json(fp, chunk_size):
+        if not isinstance(obj, dict) or not isinstance(obj.get("value"), dict):
+            continue
+        full_category = obj.get("category", "")
+        category = full_category.split("$", 1)[0]
+        if categories is not None and category not in categories:
+            continue
+        if category in filters and not full_category.startswith(filters[category]):
+            continue
+
+        settings = merged.setdefault(category, {})
+        for key, value in obj["value"].items():
+            settings.setdefault(key, value)
+
+    return merged
+
+
+def model_name(path):
+    """Return the model of a dump file, e.g. "C2" of "defaultSettings-C2.json"."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name.split("-", 1)[1] if name.startswith("defaultSettings-") else name
+
+
+def merge_settings_files(paths, categories=None, output_dir=".", filters=CATEGORY_FILTERS):
+    """Merge defaultSettings dumps and write <category>-<model>.json files, return the written paths."""
+    written = []
+    for path in paths:
+        model = model_name(path)
+        with open(path) as f:
+            merged = merge_default_settings(f, categories, filters)
+        for category, settings in merged.items():
+            output = os.path.join(output_dir, f"{category}-{model}.json")
+            with open(output, "w") as outfile:
+                json.dump(settings, outfile, sort_keys=True, indent=4)
+            written.append(output)
+    return written
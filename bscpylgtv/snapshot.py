@@ -0,0 +1,120 @@
+import hashlib
+import json
+import time
+
+SNAPSHOT_VERSION = 1
+CONFIG_PREFIX = "config:"
+
+
+def category_hash(settings):
+    """Return the sha256 hex digest of the canonical JSON of a settings dict."""
+    data = json.dumps(settings, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def config_category(key):
+    """Return the snapshot category of a config key, e.g. "config:tv.model" for "tv.model.serialNumber"."""
+    return CONFIG_PREFIX + key.rsplit(".", 1)[0]
+
+
+def diff_settings(baseline, settings):
+    """Return the per-key diff of two settings dicts, empty if they are equal.
+
+    {"added": {key: value}, "removed": {key: value}, "changed": {key: [baseline value, value]}}
+    """
+    diff = {}
+    added = {key: value for key, value in settings.items() if key not in baseline}
+    removed = {key: value for key, value in baseline.items() if key not in settings}
+    changed = {
+        key: [value, settings[key]] for key, value in baseline.items()
+        if key in settings and settings[key] != value
+    }
+    if added:
+        diff["added"] = added
+    if removed:
+        diff["removed"] = removed
+    if changed:
+        diff["changed"] = changed
+    return diff
+
+
+class SettingsSnapshot:
+    """Settings of a TV per category with a content hash of every category.
+
+    Categories are the system settings categories of get_system_settings and the config keys of
+    get_configs grouped by their prefix, e.g. "config:tv.model" for "tv.model.serialNumber".
+    Comparing two snapshots only walks the categories whose hashes differ.
+    """
+
+    def __init__(self, categories, host=None, created=None, errors=None):
+        self.categories = {name: dict(settings) for name, settings in categories.items()}
+        self.hashes = {name: category_hash(settings) for name, settings in self.categories.items()}
+        self.host = host
+        self.created = time.time() if created is None else created
+        self.errors = dict(errors or {})
+
+    @classmethod
+    def from_bulk(cls, result, host=None):
+        """Create a snapshot from the result of WebOsClient.get_system_settings_bulk."""
+        categories = dict(result.get("settings", {}))
+        for key, value in result.get("configs", {}).items():
+            categories.setdefault(config_category(key), {})[key] = value
+        errors = dict(result.get("errors", {}))
+        for key, error in result.get("config_errors", {}).items():
+            errors[config_category(key)] = error
+        return cls(categories, host, errors=errors)
+
+    @classmethod
+    async def capture(cls, client, categories=None, configs=None, max_concurrent=4):
+        """Read the settings of a connected client and return their snapshot."""
+        result = await client.get_system_settings_bulk(categories, configs, max_concurrent)
+        return cls.from_bulk(result, client.ip)
+
+    def to_dict(self):
+        return {
+            "version": SNAPSHOT_VERSION,
+            "host": self.host,
+            "created": self.created,
+            "errors": self.errors,
+            "categories": {
+                name: {"hash": self.hashes[name], "settings": settings} for name, settings in self.categories.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {data.get('version')}, must be {SNAPSHOT_VERSION}.")
+        categories = {name: category["settings"] for name, category in data["categories"].items()}
+        return cls(categories, data.get("host"), data.get("created"), data.get("errors"))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, sort_keys=True, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def diff(self, other):
+        """Return category -> diff_settings of other against this snapshot (as baseline).
+
+        Equal categories (same hash) are left out, categories missing from one side are
+        fully added or removed. Categories which failed to be read on either side are skipped.
+        """
+        result = {}
+        for name in list(self.categories) + [name for name in other.categories if name not in self.categories]:
+            if name in self.errors or name in other.errors:
+                continue
+            if self.hashes.get(name) == other.hashes.get(name):
+                continue
+            diff = diff_settings(self.categories.get(name, {}), other.categories.get(name, {}))
+            if diff:
+                result[name] = diff
+        return result
+
+    def __eq__(self, other):
+        if not isinstance(other, SettingsSnapshot):
+            return NotImplemented
+        return self.hashes == other.hashes
@@ -1,9 +1,13 @@
 import argparse
 import asyncio
 import json
+import os
+import sys
 
 from ._version import __version__
-from bscpylgtv import WebOsClient
+from bscpylgtv import WebOsClient, WebOsFleet
+from .settings_tools import merge_settings_files
+from .snapshot import SettingsSnapshot
 
 
 async def list_keys(path_key_file):
@@ -109,3 +113,120 @@ def bscpylgtvcommand():
         args = parser.parse_args(remainder, namespace=argsL)
 
         asyncio.run(runloop(args))
+
+
+async def capture_snapshots(args, hosts):
+    """Return host -> SettingsSnapshot or exception of every host."""
+    fleet = await WebOsFleet.create(
+        hosts, key_file_path=args.path_key_file, ping_interval=None, states=[], without_ssl=args.without_ssl
+    )
+    try:
+        results = await fleet.execute(
+            "get_system_settings_bulk", configs=args.configs, max_concurrent=args.max_concurrent, timeout=args.timeout
+        )
+    finally:
+        await fleet.disconnect()
+
+    return {
+        host: result if isinstance(result, Exception) else SettingsSnapshot.from_bulk(result, host)
+        for host, result in results.items()
+    }
+
+
+async def snapshot_runloop(args):
+    """Save the snapshot of a TV or diff TVs (or snapshot files) against a baseline, return the exit code."""
+    sources = [args.host] if args.action == "save" else [args.baseline] + args.targets
+    hosts = [source for source in sources if not os.path.isfile(source)]
+    snapshots = await capture_snapshots(args, hosts) if hosts else {}
+    for source in sources:
+        if source not in snapshots:
+            snapshots[source] = SettingsSnapshot.load(source)
+
+    failed = {source: snapshot for source, snapshot in snapshots.items() if isinstance(snapshot, Exception)}
+    for source, ex in failed.items():
+        print(f"{source}: {ex}", file=sys.stderr)
+
+    if args.action == "save":
+        if failed:
+            return 2
+        if args.output:
+            snapshots[args.host].save(args.output)
+        else:
+            print(json.dumps(snapshots[args.host].to_dict(), sort_keys=True, indent=4))
+        return 0
+
+    if args.baseline in failed:
+        return 2
+    baseline = snapshots[args.baseline]
+    diffs = {target: baseline.diff(snapshots[target]) for target in args.targets if target not in failed}
+    print(json.dumps(diffs, sort_keys=True, indent=4))
+    if failed:
+        return 2
+    return 1 if any(diffs.values()) else 0
+
+
+def bscpylgtvsnapshot():
+    parser = argparse.ArgumentParser(description="Save settings snapshots of LG WebOs TVs or diff them against a baseline.")
+    parser.add_argument(
+        "-v", "--version",
+        action="version",
+        version=f'%(prog)s {__version__}'
+    )
+    parser.add_argument(
+        "-p", "--path_key_file", type=str, help="optional path to key file"
+    )
+    parser.add_argument(
+        "-w", "--without_ssl",
+        dest="without_ssl",
+        action="store_true",
+        help="optional connecting without SSL"
+    )
+    parser.add_argument(
+        "-g", "--configs",
+        type=str,
+        nargs="+",
+        default=["tv.model.*"],
+        help='config keys to include (default: "tv.model.*")'
+    )
+    parser.add_argument(
+        "-m", "--max_concurrent", type=int, default=4, help="maximum number of concurrent requests per TV"
+    )
+    parser.add_argument(
+        "-t", "--timeout", type=float, default=30, help="timeout in seconds per TV"
+    )
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    save = subparsers.add_parser("save", help="save the snapshot of a TV")
+    save.add_argument("host", type=str, help="hostname or ip address of the TV")
+    save.add_argument("-o", "--output", type=str, help="snapshot file to write (default: stdout)")
+
+    diff = subparsers.add_parser("diff", help="diff TVs or snapshot files against a baseline, exit code is 1 on drift")
+    diff.add_argument("baseline", type=str, help="snapshot file or hostname of the baseline TV")
+    diff.add_argument("targets", type=str, nargs="+", help="snapshot files or hostnames of the TVs to compare")
+
+    sys.exit(asyncio.run(snapshot_runloop(parser.parse_args())))
+
+
+def bscpylgtvmergesettings():
+    parser = argparse.ArgumentParser(description="Merge defaultSettings.json dumps of LG WebOs firmwares per category.")
+    parser.add_argument(
+        "-v", "--version",
+        action="version",
+        version=f'%(prog)s {__version__}'
+    )
+    parser.add_argument(
+        "-c", "--categories",
+        type=str,
+        nargs="+",
+        help="categories to merge, e.g. picture aiPicture option other (default: all)"
+    )
+    parser.add_argument(
+        "-o", "--output_dir", type=str, default=".", help="directory of the <category>-<model>.json files"
+    )
+    parser.add_argument(
+        "files", type=str, nargs="+", help="dump files named like defaultSettings-<model>.json"
+    )
+
+    args = parser.parse_args()
+    for path in merge_settings_files(args.files, args.categories, args.output_dir):
+        print(path)
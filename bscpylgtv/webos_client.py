@@ -1,10 +1,17 @@
 import asyncio
 import base64
+import contextlib
+import contextvars
 import copy
 import functools
 import json
+import inspect
 import os
+import random
+import re
 import ssl
+import time
+from collections import deque
 from datetime import timedelta
 
 try:
@@ -15,12 +22,22 @@ except ImportError:
 import websockets
 
 from . import buttons as btn
+from ._version import __version__
 from . import endpoints as ep
-from .exceptions import PyLGTVPairException, PyLGTVCmdException, PyLGTVCmdError, PyLGTVServiceNotFoundError
+from .codec import get_codec
+from .exceptions import (
+    PyLGTVPairException,
+    PyLGTVCmdException,
+    PyLGTVCmdError,
+    PyLGTVServiceNotFoundError,
+    PyLGTVRequestTimeoutError,
+)
+from .frame_tools import FrameCache, build_data_frame
+from .metrics import ClientMetrics
 from .handshake import REGISTRATION_MESSAGE
 from .storage_proto import StorageProto
 from .storage_sqlitedict import StorageSqliteDict
-from .constants import LUT3D_SIZES, DV_CONFIG_TYPES
+from .constants import LUT3D_SIZES, DV_CONFIG_TYPES, SYSTEM_SETTINGS_KEYS
 
 if np:
     from . import cal_commands as cal
@@ -43,6 +60,10 @@ if np:
         read_3by3_gamut_file,
         read_3dlut_file,
         backup_lut_into_file,
+        write_binary_lut_file,
+        read_binary_lut_file,
+        write_calibration_snapshot,
+        read_calibration_snapshot,
         unity_lut_1d,
         unity_lut_3d,
         convert_1dlut_to_cal_format,
@@ -50,9 +71,485 @@ if np:
 
 SOUND_OUTPUTS_TO_DELAY_CONSECUTIVE_VOLUME_STEPS = {"external_arc"}
 
+# the timeout of a ping isn't shorter than this (seconds), even on a fast network
+PING_TIMEOUT_MIN = 0.5
+# consecutive unanswered pings of a dead connection
+PING_MAX_MISSES = 3
+
+# cached settings not kept up to date by a subscription are fetched again after this (seconds)
+SETTINGS_CACHE_MAX_AGE = 60
+
+SUBSCRIPTION_QUEUE_POLICIES = ("block", "drop_oldest", "conflate")
+# block suspends reading the connection, it's only allowed per subscribe() for callbacks not sending requests
+CLIENT_QUEUE_POLICIES = ("drop_oldest", "conflate")
+# subscriptions pushing the full state every time, only their latest message matters
+CONFLATE_STATE_URIS = {
+    ep.GET_POWER_STATE,
+    ep.GET_CURRENT_APP_INFO,
+    ep.GET_INPUTS,
+    ep.GET_AUDIO_STATUS,
+    ep.GET_VOLUME,
+    ep.GET_TV_CHANNELS,
+    ep.GET_CURRENT_CHANNEL,
+    ep.GET_CHANNEL_INFO,
+    ep.GET_SOUND_OUTPUT,
+}
+
+# top level "id" of a frame, only searched before the "payload" key where nested ids can't occur
+FRAME_ID_PATTERN = re.compile(r'"id"\s*:\s*(?:(-?\d+)\s*[,}]|"([^"\\]*)")')
+FRAME_ID_UNKNOWN = object()
+
+# loop time until the requests of the current task have to be answered, see request_deadline()
+REQUEST_DEADLINE = contextvars.ContextVar("request_deadline", default=None)
+
+
+@contextlib.contextmanager
+def request_deadline(timeout):
+    """Share one deadline of timeout seconds between all the requests made in the block.
+
+    with request_deadline(5):
+        await client.get_power_state()
+        await client.get_picture_settings()
+
+    Nested blocks can only shorten the deadline, tasks created in the block inherit it.
+    """
+    deadline = asyncio.get_running_loop().time() + timeout
+    current = REQUEST_DEADLINE.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = REQUEST_DEADLINE.set(deadline)
+    try:
+        yield deadline
+    finally:
+        REQUEST_DEADLINE.reset(token)
+
+
+def frame_id(raw_msg):
+    """Extract the id of a frame without parsing it, return FRAME_ID_UNKNOWN if it isn't possible."""
+    if not isinstance(raw_msg, str):
+        return FRAME_ID_UNKNOWN
+
+    end = raw_msg.find('"payload"')
+    match = FRAME_ID_PATTERN.search(raw_msg, 0, len(raw_msg) if end < 0 else end)
+    if match is None:
+        return FRAME_ID_UNKNOWN
+    return int(match.group(1)) if match.group(1) is not None else match.group(2)
+
+
+class RequestPipeline:
+    """Collect requests and send them back-to-back when the context manager exits.
+
+    async with client.pipeline() as pipe:
+        pipe.request(ep.GET_POWER_STATE)
+        pipe.request(ep.GET_SYSTEM_SETTINGS, {"category": "picture", "keys": ["contrast"]})
+    print(pipe.results)
+    """
+
+    def __init__(self, client, timeout=None):
+        self.client = client
+        self.timeout = timeout
+        self.requests = []
+        self.results = None
+
+    def request(self, uri, payload=None):
+        """Queue a request, return its index in results."""
+        self.requests.append((uri, payload))
+        return len(self.requests) - 1
+
+    async def execute(self, return_exceptions=True):
+        requests = self.requests
+        self.requests = []
+        self.results = await self.client.request_many(requests, return_exceptions, self.timeout)
+        return self.results
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.execute()
+
+
+# the active SettingsTransaction of the current task, see WebOsClient.settings_transaction()
+SETTINGS_TRANSACTION = contextvars.ContextVar("settings_transaction", default=None)
+
+
+class SettingsTransaction:
+    """Collect the luna settings writes of a client and send them merged when the context manager exits.
+
+    async with client.settings_transaction() as tx:
+        await client.set_current_picture_settings({"backlight": 80})
+        await client.set_current_picture_settings({"contrast": 85, "backlight": 85})
+        await client.set_other_settings({"whiteStabilizer": 13})
+        await client.set_configs({"tv.model.motionProMode": "OLED Motion Pro"})
+    print(tx.writes, tx.alerts)
+
+    Within the block luna_request calls of the client (made by this task) are queued and return
+    None. setSystemSettings writes of the same category (and current_app) are merged into one
+    payload, as are setConfigs writes, later values of the same key win. Every merged payload
+    costs one luna alert, other luna calls are sent as they are. Picture mode changes aren't
+    merged with the writes around them, the writes after them may depend on the new mode. With pipelined
+    the alerts of a group are created and closed with request_many, in two round-trips.
+    """
+
+    def __init__(self, client, pipelined=False):
+        self.client = client
+        self.pipelined = pipelined
+        self.groups = [{}]
+        self.writes = 0
+        self.alerts = 0
+        self.results = None
+        self._token = None
+
+    def queue(self, uri, params):
+        """Queue a luna call, merged with the previous writes if possible."""
+        self.writes += 1
+        mode_change = uri == ep.LUNA_SET_SYSTEM_SETTINGS and "pictureMode" in params.get("settings", {})
+        if mode_change:
+            self.barrier()
+        group = self.groups[-1]
+
+        if uri == ep.LUNA_SET_SYSTEM_SETTINGS:
+            key = (uri, params.get("category"), params.get("current_app"))
+            field = "settings"
+        elif uri == ep.LUNA_SET_CONFIGS:
+            key = (uri,)
+            field = "configs"
+        else:
+            group[object()] = (uri, params)
+            return
+
+        if key in group:
+            group[key][1][field].update(params[field])
+        else:
+            group[key] = (uri, {**params, field: dict(params[field])})
+
+        if mode_change:
+            self.barrier()
+
+    def barrier(self):
+        """Don't merge the following writes with the previous ones."""
+        if self.groups[-1]:
+            self.groups.append({})
+
+    async def commit(self):
+        """Send the queued writes, return the results of the luna requests in order."""
+        groups = [group for group in self.groups if group]
+        self.groups = [{}]
+        results = []
+        for group in groups:
+            calls = list(group.values())
+            self.alerts += len(calls)
+            if self.pipelined:
+                results.extend(await self.client.luna_requests(calls))
+            else:
+                for uri, params in calls:
+                    results.append(await self.client.luna_request(uri, params))
+
+        self.results = results
+        return results
+
+    async def __aenter__(self):
+        self._token = SETTINGS_TRANSACTION.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        SETTINGS_TRANSACTION.reset(self._token)
+        if exc_type is None:
+            await self.commit()
+
+
+class SettingsCache:
+    """Write-through cache of system settings per category, used to skip writes that change nothing.
+
+    It's filled by load(), by subscribe() (and the picture_settings state subscription) and by
+    every settings write of luna_request. apply() only writes the keys which differ from the cached
+    values, unknown keys are fetched first with one get_system_settings request. Values are compared
+    as strings, the TV returns most of them as strings even if they were written as numbers.
+    Entries older than max_age seconds are fetched again unless a subscription keeps them up to date,
+    the cache is cleared on disconnect.
+    """
+
+    def __init__(self, client, max_age=SETTINGS_CACHE_MAX_AGE):
+        self.client = client
+        self.max_age = max_age
+        self.categories = {}
+        self.stats = {"hits": 0, "misses": 0, "fetches": 0, "writes": 0}
+
+    def clear(self, category=None):
+        if category is None:
+            self.categories.clear()
+        else:
+            self.categories.pop(category, None)
+
+    def update(self, category, settings, subscribed=False):
+        """Store settings (read from or written to the TV) of category, subscribed ones never expire."""
+        if not isinstance(settings, dict):
+            return
+        now = None if subscribed else time.monotonic()
+        values = self.categories.setdefault(category, {})
+        for key, value in settings.items():
+            values[key] = (value, now)
+
+    def written(self, params, ok=True):
+        """Follow a settings write (params of LUNA_SET_SYSTEM_SETTINGS), forget the category if it failed."""
+        category = params.get("category", "")
+        settings = params.get("settings")
+        if not ok or "$" in category or not isinstance(settings, dict):
+            # the settings of a specific input or picture mode may be the current ones
+            self.clear(category.split("$", 1)[0])
+            return
+        if "pictureMode" in settings:
+            # the other values belong to the previous picture mode
+            self.clear(category)
+        self.update(category, settings)
+
+    def get(self, category, key, default=None):
+        """Return the cached value of key, default if it's missing or expired."""
+        entry = self.categories.get(category, {}).get(key)
+        if entry is None:
+            return default
+        if entry[1] is not None and self.max_age is not None and time.monotonic() - entry[1] > self.max_age:
+            return default
+        return entry[0]
+
+    async def load(self, category, keys):
+        """Fetch keys of category from the TV into the cache, return the read settings."""
+        self.stats["fetches"] += 1
+        res = await self.client.get_system_settings(category, list(keys))
+        settings = res.get("settings", {})
+        self.update(category, settings)
+        return settings
+
+    async def subscribe(self, category, keys):
+        """Keep keys of category up to date with a subscription."""
+        async def settings(payload):
+            self.update(category, payload.get("settings"), subscribed=True)
+
+        return await self.client.subscribe(settings, ep.GET_SYSTEM_SETTINGS, {"category": category, "keys": list(keys)})
+
+    @staticmethod
+    def same(cached, value):
+        if cached == value:
+            return True
+        if isinstance(cached, (dict, list)) or isinstance(value, (dict, list)):
+            return False
+        if isinstance(cached, bool) or isinstance(value, bool):
+            return str(cached).lower() == str(value).lower()
+        return str(cached) == str(value)
+
+    async def apply(self, category, settings, current_app=None):
+        """Write the settings of category which differ from the TV, return the written ones."""
+        missing = object()
+        unknown = [key for key in settings if self.get(category, key, missing) is missing]
+        if unknown:
+            try:
+                await self.load(category, unknown)
+            except PyLGTVCmdException:
+                # e.g. categories of specific picture modes can't be read, write everything
+                pass
+
+        changed = {}
+        for key, value in settings.items():
+            cached = self.get(category, key, missing)
+            if cached is not missing and self.same(cached, value):
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+                changed[key] = value
+
+        if changed:
+            params = {"category": category, "settings": changed}
+            if current_app is not None:
+                params["current_app"] = current_app
+            self.stats["writes"] += 1
+            transaction = SETTINGS_TRANSACTION.get()
+            queued = transaction is not None and transaction.client is self.client
+            await self.client.luna_request(ep.LUNA_SET_SYSTEM_SETTINGS, params)
+            if queued:
+                # luna_request follows the write when the transaction is committed, until then
+                # the queued value is expected, so a repeated apply isn't queued again
+                self.written(params)
+
+        return changed
+
+
+class SubscriptionQueue:
+    """Queue of the messages of one subscription waiting for its callback.
+
+    With maxsize (0 is unbounded) the overflow policy decides what happens when it's full:
+    block: the consumer waits, so the backlog stays in the websocket (and TCP) buffers, meanwhile
+        no other response is read either, so its callback must not send requests (it would deadlock),
+    drop_oldest: the oldest queued message is dropped,
+    conflate: only the latest queued message is kept, regardless of maxsize.
+    The first message answers subscribe() and it's never dropped.
+    """
+
+    def __init__(self, uri, maxsize=0, policy="drop_oldest"):
+        if policy not in SUBSCRIPTION_QUEUE_POLICIES:
+            raise PyLGTVCmdException(
+                f"Invalid subscription queue policy {policy}, must be one of: {', '.join(SUBSCRIPTION_QUEUE_POLICIES)}."
+            )
+        self.uri = uri
+        self.maxsize = maxsize or 0
+        self.policy = policy
+        self.items = deque()
+        self.stats = {"received": 0, "dropped": 0, "max_depth": 0}
+        self._protected = 0
+        self._first = True
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+
+    def __len__(self):
+        return len(self.items)
+
+    async def put(self, msg):
+        self.stats["received"] += 1
+        droppable = len(self.items) - self._protected
+        if self.policy == "conflate":
+            if droppable:
+                self.items.pop()
+                self.stats["dropped"] += 1
+        elif self.maxsize and len(self.items) >= self.maxsize:
+            if self.policy == "drop_oldest":
+                if droppable:
+                    del self.items[self._protected]
+                    self.stats["dropped"] += 1
+            else:
+                while len(self.items) >= self.maxsize:
+                    self._not_full.clear()
+                    await self._not_full.wait()
+
+        if self._first:
+            self._first = False
+            self._protected = 1
+        self.items.append(msg)
+        self.stats["max_depth"] = max(self.stats["max_depth"], len(self.items))
+        self._not_empty.set()
+
+    async def get(self):
+        while not self.items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        self._protected = 0
+        msg = self.items.popleft()
+        self._not_full.set()
+        return msg
+
+
+class PointerStream:
+    """Send pointer motion at a limited rate, adding up the deltas of the samples in between.
+
+    async with client.pointer_stream(rate=60) as stream:
+        stream.move(3, -1)
+        stream.scroll(0, 5)
+
+    The first sample is sent right away, then at most rate frames per second are sent, the samples
+    arriving meanwhile are merged into the pending move/scroll records. A move with a different
+    down value or a click starts a new record, so the order of the events is kept.
+    Samples of a batch that couldn't be sent are counted as dropped, the error is kept in last_error.
+    """
+
+    def __init__(self, client, rate=60):
+        self.client = client
+        self.interval = 1 / rate
+        self.pending = []
+        self.pending_samples = 0
+        self.stats = {"samples": 0, "merged": 0, "frames": 0, "dropped": 0}
+        self.last_error = None
+        self._event = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def _add(self, kind, dx=0, dy=0, down=None):
+        self.stats["samples"] += 1
+        self.pending_samples += 1
+        if kind != "click" and self.pending:
+            last = self.pending[-1]
+            if last[0] == kind and last[3] == down:
+                last[1] += dx
+                last[2] += dy
+                self.stats["merged"] += 1
+                return
+        self.pending.append([kind, dx, dy, down])
+        self._event.set()
+
+    def move(self, dx, dy, down=0):
+        """Add a cursor motion sample."""
+        self._add("move", dx, dy, down)
+
+    def scroll(self, dx, dy):
+        """Add a scroll sample."""
+        self._add("scroll", dx, dy)
+
+    def click(self):
+        """Add a click after the pending motion."""
+        self._add("click")
+
+    async def flush(self):
+        """Send the pending records now."""
+        async with self._lock:
+            await self._flush()
+
+    async def _flush(self):
+        pending, samples = self.pending, self.pending_samples
+        self.pending, self.pending_samples = [], 0
+        self._event.clear()
+        if not pending:
+            return
+
+        messages = []
+        for kind, dx, dy, down in pending:
+            if kind == "move":
+                messages.append(f"type:move\ndx:{dx}\ndy:{dy}\ndown:{down}\n\n")
+            elif kind == "scroll":
+                messages.append(f"type:scroll\ndx:{dx}\ndy:{dy}\n\n")
+            else:
+                messages.append("type:click\n\n")
+
+        try:
+            await self.client.send_input_messages(messages)
+        except PyLGTVCmdException as ex:
+            self.stats["dropped"] += samples
+            self.last_error = ex
+        else:
+            self.stats["frames"] += len(messages)
+
+    async def _run(self):
+        while True:
+            await self._event.wait()
+            # a batch in flight is finished even if the stream is closed meanwhile
+            await asyncio.shield(self.flush())
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the stream and send the pending records."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
 
 class WebOsClient:
     STATIC_STATES = {"system_info", "software_info"}
+    STATE_PROPERTIES = ("power_state", "current_appId", "muted", "volume", "current_channel", "channel_info",
+                        "channels", "apps", "inputs", "system_info", "software_info", "hello_info",
+                        "sound_output", "picture_settings")
 
     def __init__(
         self,
@@ -61,6 +558,7 @@ class WebOsClient:
         timeout_connect=2,
         ping_interval=1,
         ping_timeout=20,
+        ping_interval_max=10,
         client_key=None,
         volume_step_delay_ms=None,
         get_hello_info=False,
@@ -69,6 +567,19 @@ class WebOsClient:
         calibration_info=None,
         without_ssl=False,
         storage: StorageProto=None,
+        ssl_context=None,
+        auto_reconnect=False,
+        reconnect_delay_min=0.5,
+        reconnect_delay_max=30,
+        state_update_delay=None,
+        stream_calibration=False,
+        json_codec=None,
+        frame_cache=None,
+        timeout_request=None,
+        subscription_queue_size=0,
+        subscription_queue_policy="drop_oldest",
+        conflate_states=True,
+        metrics=None,
     ):
         """Initialize the client."""
         self.ip = ip
@@ -78,8 +589,13 @@ class WebOsClient:
         self.client_key = client_key
         self.command_count = 0
         self.timeout_connect = timeout_connect
+        self.timeout_request = timeout_request
         self.ping_interval = ping_interval
         self.ping_timeout = ping_timeout
+        self.ping_interval_max = max(ping_interval_max, ping_interval or 0)
+        self._ping_rtt = None
+        self._ping_rtt_var = None
+        self._last_inbound = 0
         self.getHelloInfo = get_hello_info
         self.storage = storage
         self.connect_task = None
@@ -89,6 +605,40 @@ class WebOsClient:
         self.handler_tasks = set()
         self.callbacks = {}
         self.futures = {}
+        self.subscriptions = {}
+        self.subscription_queues = {}
+        self.subscription_queue_size = subscription_queue_size
+        if subscription_queue_policy not in CLIENT_QUEUE_POLICIES:
+            raise PyLGTVCmdException(
+                f"Invalid subscription queue policy {subscription_queue_policy}, must be one of: {', '.join(CLIENT_QUEUE_POLICIES)}."
+            )
+        self.subscription_queue_policy = subscription_queue_policy
+        self.conflate_states = conflate_states
+        self.auto_reconnect = auto_reconnect
+        self.reconnect_delay_min = reconnect_delay_min
+        self.reconnect_delay_max = reconnect_delay_max
+        self.reconnect_task = None
+        self.reconnect_count = 0
+        self.state_update_delay = state_update_delay
+        self.changed_states = set()
+        self._dispatched_state = None
+        self._state_update_task = None
+        self._last_subscriptions = None
+        self.stream_calibration = stream_calibration
+        self.calibration_stats = {}
+        self._send_text_bytes = None
+        self._calibration_picture_mode = None
+        self._channels_pending = False
+        self.connect_stats = {}
+        self.settings_cache = SettingsCache(self)
+        # True for a new ClientMetrics labeled with the host, or a ClientMetrics instance
+        self.metrics = ClientMetrics(labels={"host": ip}) if metrics is True else (metrics or None)
+        self._metrics_pending = {}
+        self.codec = get_codec(json_codec)
+        # native codecs serialize whole messages faster than the templates are filled in
+        if frame_cache is None:
+            frame_cache = self.codec.name == "json"
+        self.frame_cache = FrameCache(self.codec.dumps) if frame_cache else None
         self._power_state = {}
         self._current_appId = None
         self._muted = None
@@ -108,6 +658,7 @@ class WebOsClient:
         self.state_update_callbacks = []
         self.doStateUpdate = False
         self._volume_step_lock = asyncio.Lock()
+        self._input_lock = asyncio.Lock()
         self._volume_step_delay = (
             timedelta(milliseconds=volume_step_delay_ms)
             if volume_step_delay_ms is not None
@@ -120,9 +671,15 @@ class WebOsClient:
             if "dovi" in calibration_info and calibration_info["dovi"] in DV_CONFIG_TYPES:
                 self._calibration_info['dovi'] = DV_CONFIG_TYPES[calibration_info["dovi"]]
         if not without_ssl:
-            self._ssl_context = ssl.create_default_context()
-            self._ssl_context.check_hostname = False
-            self._ssl_context.verify_mode = ssl.CERT_NONE
+            self._ssl_context = ssl_context or self.create_ssl_context()
+
+    @staticmethod
+    def create_ssl_context():
+        """Create the SSL context used for the connections, TVs use self-signed certificates."""
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        return ssl_context
 
     @classmethod
     async def create(cls, *args, **kwargs):
@@ -147,9 +704,20 @@ class WebOsClient:
         if not self.is_connected():
             self.connect_result = asyncio.Future()
             self.connect_task = asyncio.create_task(self.connect_handler(self.connect_result))
+        if self.auto_reconnect and self.reconnect_task is None:
+            self.reconnect_task = asyncio.create_task(self.reconnect_handler())
         return await self.connect_result
 
     async def disconnect(self):
+        if self.reconnect_task is not None:
+            self.reconnect_task.cancel()
+            try:
+                await self.reconnect_task
+            except asyncio.CancelledError:
+                pass
+        await self._close_connection()
+
+    async def _close_connection(self):
         if self.is_connected():
             self.connect_task.cancel()
             try:
@@ -157,6 +725,31 @@ class WebOsClient:
             except asyncio.CancelledError:
                 pass
 
+    async def reconnect_handler(self):
+        """Keep the connection up, reconnect with jittered exponential backoff when it's lost."""
+        attempt = 0
+        try:
+            while True:
+                if self.connect_task is not None:
+                    await asyncio.wait({self.connect_task})
+                    # connection dropped while the tv was on, retry quickly
+                    if self._dispatched_state is not None:
+                        attempt = 0
+
+                delay = min(self.reconnect_delay_max, self.reconnect_delay_min * 2 ** attempt)
+                attempt += 1
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+
+                try:
+                    await self.connect()
+                    self.reconnect_count += 1
+                    if self.metrics is not None:
+                        self.metrics.reconnected()
+                except Exception:
+                    pass
+        finally:
+            self.reconnect_task = None
+
     def is_registered(self):
         """Paired with the tv."""
         return self.client_key is not None
@@ -172,6 +765,7 @@ class WebOsClient:
     async def connect_handler(self, res):
         ws = None
         try:
+            connect_start = time.perf_counter()
             ws = await asyncio.wait_for(
                 websockets.connect(
                     f"{self.proto}://{self.ip}:{self.port}",
@@ -185,9 +779,9 @@ class WebOsClient:
 
             if self.getHelloInfo:
                 # send hello
-                await ws.send(json.dumps({"id": "hello", "type": "hello"}))
+                await self._send_frame(self.codec.dumps({"id": "hello", "type": "hello"}), ws)
                 raw_response = await ws.recv()
-                response = json.loads(raw_response)
+                response = self.codec.loads(raw_response)
 
                 if response["type"] == "hello":
                     self._hello_info = response["payload"]
@@ -195,13 +789,13 @@ class WebOsClient:
                     raise PyLGTVPairException("Unable to say hello")
 
             # send registration
-            await ws.send(json.dumps(self.registration_msg()))
+            await self._send_frame(self.codec.dumps(self.registration_msg()), ws)
             raw_response = await ws.recv()
-            response = json.loads(raw_response)
+            response = self.codec.loads(raw_response)
 
             if (response["type"] == "response" and response["payload"]["pairingType"] == "PROMPT"):
                 raw_response = await ws.recv()
-                response = json.loads(raw_response)
+                response = self.codec.loads(raw_response)
 
                 if response["type"] == "registered":
                     self.client_key = response["payload"]["client-key"]
@@ -217,52 +811,30 @@ class WebOsClient:
 
             self.connection = ws
 
-            if self.states:
-                selectedStates = self.states
-                # set static states, possible values: ["system_info", "software_info"]
-                staticStates = selectedStates.intersection(self.STATIC_STATES)
-                if staticStates:
-                    # e.g.: [self._system_info] = await asyncio.gather(self.get_system_info())
-                    for stateElem in staticStates:
-                        stateResult = await asyncio.gather(getattr(self, f'get_{stateElem}')())
-                        setattr(self, f'_{stateElem}', (stateResult or [None])[0])
-                        selectedStates.remove(stateElem)
-
-                # subscribe to state updates, avoid partial updates during initial subscription
-                # possible values: ["power", "current_app", "muted", "volume", "apps", "inputs",
-                #                   "sound_output", "picture_settings"]
-                subscribe_coros = set()
-                if selectedStates:
-                    # e.g.: subscribe_coros.add(self.subscribe_power(self.set_power_state))
-                    for stateElem in selectedStates:
-                        subscriber = f'subscribe_{stateElem}'
-                        setter = f'set_{stateElem}_state'
-
-                        if callable(getattr(self, subscriber, None)) and callable(getattr(self, setter, None)):
-                            subscribe_coros.add(getattr(self, subscriber)(getattr(self, setter)))
-
-                if subscribe_coros:
-                    subscribe_tasks = set()
-
-                    for coro in subscribe_coros:
-                        subscribe_tasks.add(asyncio.create_task(coro))
-
-                    await asyncio.wait(subscribe_tasks)
-
-                    for task in subscribe_tasks:
-                        try:
-                            task.result()
-                        except (PyLGTVCmdError, PyLGTVServiceNotFoundError):
-                            pass
+            handshake_done = time.perf_counter()
+
+            await self._bootstrap_states()
 
             # set placeholder power state if not available
             if not self._power_state:
                 self._power_state = {"state": "Unknown"}
 
+            if self._last_subscriptions:
+                await self._replay_subscriptions()
+
             self.doStateUpdate = True
 
             if self.state_update_callbacks:
-                await self.do_state_update_callbacks()
+                await self._dispatch_state_update()
+
+            ready = time.perf_counter()
+            self.connect_stats = {
+                "handshake": handshake_done - connect_start,
+                "bootstrap": ready - handshake_done,
+                "ready": ready - connect_start,
+            }
+            if self.metrics is not None:
+                self.metrics.connected(self.connect_stats["ready"])
 
             res.set_result(True)
 
@@ -272,6 +844,21 @@ class WebOsClient:
             if not res.done():
                 res.set_exception(ex)
         finally:
+            supervised = self.reconnect_task is not None
+            # keep the last known state on a transient drop, it's diffed after reconnecting
+            transient = supervised and self.doStateUpdate and self.is_on
+            if transient:
+                if self._dispatched_state is None:
+                    self._dispatched_state = self._state_snapshot()
+            elif self.doStateUpdate:
+                self._dispatched_state = None
+
+            if self._state_update_task is not None:
+                self._state_update_task.cancel()
+                self._state_update_task = None
+            if supervised and self.subscriptions:
+                self._last_subscriptions = list(self.subscriptions.values())
+
             for task in self.handler_tasks:
                 if not task.done():
                     task.cancel()
@@ -279,6 +866,10 @@ class WebOsClient:
             for future in self.futures.values():
                 future.cancel()
 
+            if self.metrics is not None:
+                for uid in list(self._metrics_pending):
+                    self._metrics_failed(uid, "cancelled")
+
             closeout = set()
             closeout.update(self.handler_tasks)
 
@@ -288,8 +879,9 @@ class WebOsClient:
             if self.input_connection is not None:
                 closeout.add(asyncio.create_task(self.input_connection.close()))
 
-            for callback in self.state_update_callbacks:
-                closeout.add(callback(self))
+            if not transient:
+                for callback in self.state_update_callbacks:
+                    closeout.add(asyncio.create_task(callback(self)))
 
             if closeout:
                 closeout_task = asyncio.create_task(asyncio.wait(closeout))
@@ -302,12 +894,16 @@ class WebOsClient:
 
             self.connection = None
             self.input_connection = None
+            self.settings_cache.clear()
             self.connect_task = None
             self.connect_result = None
             self.handler_tasks = set()
             self.callbacks = {}
+            self.subscription_queues = {}
             self.futures = {}
-            self.state_update_callbacks = []
+            self.subscriptions = {}
+            if not supervised:
+                self.state_update_callbacks = []
             self.doStateUpdate = False
 
             self._power_state = {}
@@ -326,21 +922,168 @@ class WebOsClient:
             self._sound_output = None
             self._picture_settings = None
 
+    async def _bootstrap_states(self):
+        """Fetch the static states and subscribe to the state updates in one concurrent wave.
+
+        Static states, possible values: ["system_info", "software_info"], are fetched on every connect.
+        Subscriptions, possible values: ["power", "current_app", "muted", "volume", "apps", "inputs",
+        "sound_output", "picture_settings"], state update callbacks aren't called until all are done.
+        The channel list doesn't depend on the current app, so it's subscribed in the same wave,
+        the current channel (only available in Live TV) and its info are still chained to the app.
+        """
+        static_tasks = []
+        subscribe_tasks = []
+        for stateElem in self.states:
+            if stateElem in self.STATIC_STATES:
+                # e.g.: self._system_info = await self.get_system_info()
+                static_tasks.append((stateElem, asyncio.create_task(getattr(self, f'get_{stateElem}')())))
+                continue
+
+            # e.g.: self.subscribe_power(self.set_power_state)
+            subscriber = f'subscribe_{stateElem}'
+            setter = f'set_{stateElem}_state'
+            if callable(getattr(self, subscriber, None)) and callable(getattr(self, setter, None)):
+                subscribe_tasks.append(asyncio.create_task(getattr(self, subscriber)(getattr(self, setter))))
+                if stateElem == "current_app":
+                    subscribe_tasks.append(asyncio.create_task(self._subscribe_channels_state()))
+
+        tasks = [task for _, task in static_tasks] + subscribe_tasks
+        if not tasks:
+            return
+
+        try:
+            await asyncio.wait(tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        for stateElem, task in static_tasks:
+            setattr(self, f'_{stateElem}', task.result())
+
+        for task in subscribe_tasks:
+            try:
+                task.result()
+            except (PyLGTVCmdError, PyLGTVServiceNotFoundError):
+                pass
+
+    async def _subscribe_channels_state(self):
+        """Subscribe to the channel list unless it's known or pending, it fails until channels have been configured."""
+        if self._channels is not None or self._channels_pending:
+            return
+
+        self._channels_pending = True
+        try:
+            await self.subscribe_channels(self.set_channels_state)
+        except PyLGTVCmdException:
+            pass
+        finally:
+            self._channels_pending = False
+
+    def _state_snapshot(self):
+        return {name: copy.copy(getattr(self, name)) for name in self.STATE_PROPERTIES}
+
+    @staticmethod
+    def _subscription_key(uri, payload):
+        return uri, json.dumps(payload, sort_keys=True)
+
+    async def _replay_subscriptions(self):
+        """Resubscribe the subscriptions of the previous connection which aren't active yet."""
+        active = {self._subscription_key(uri, payload) for _, uri, payload in self.subscriptions.values()}
+        replay = [
+            (callback, uri, payload) for callback, uri, payload in self._last_subscriptions
+            if self._subscription_key(uri, payload) not in active
+        ]
+        self._last_subscriptions = None
+
+        if replay:
+            await asyncio.gather(
+                *[self.subscribe(callback, uri, payload) for callback, uri, payload in replay],
+                return_exceptions=True,
+            )
+
+    @property
+    def ping_rtt(self):
+        """Smoothed round-trip time of the pings on the main connection in seconds, None until measured."""
+        return self._ping_rtt
+
+    def _update_ping_rtt(self, rtt):
+        # smoothed RTT and its variation as in RFC 6298
+        if self._ping_rtt is None:
+            self._ping_rtt = rtt
+            self._ping_rtt_var = rtt / 2
+        else:
+            self._ping_rtt_var = 0.75 * self._ping_rtt_var + 0.25 * abs(self._ping_rtt - rtt)
+            self._ping_rtt = 0.875 * self._ping_rtt + 0.125 * rtt
+
+        if self.metrics is not None:
+            self.metrics.ping_rtt(rtt)
+
+    def _ping_wait(self):
+        """Timeout of one ping: from the RTT estimate, at least PING_TIMEOUT_MIN, at most ping_timeout."""
+        if self._ping_rtt is None:
+            return self.ping_timeout
+        return min(self.ping_timeout, max(PING_TIMEOUT_MIN, self._ping_rtt + 4 * self._ping_rtt_var))
+
     async def ping_handler(self, ws):
+        """Check the liveness of ws, return when it's considered dead.
+
+        The interval starts from ping_interval and doubles up to ping_interval_max while the
+        connection proves to be alive, inbound frames on the main connection count as a pong,
+        so no pings are sent while traffic is flowing. A ping unanswered within the timeout
+        derived from the RTT is a miss, it resets the interval. The connection is dead after
+        PING_MAX_MISSES consecutive misses or ping_timeout seconds without any sign of life.
+        """
+        loop = asyncio.get_running_loop()
+        interval = self.ping_interval
+        misses = 0
+        last_alive = loop.time()
         try:
             while True:
-                await asyncio.sleep(self.ping_interval)
-                if self.is_on:
-                    ping_waiter = await ws.ping()
-                    await asyncio.wait_for(ping_waiter, timeout=self.ping_timeout)
+                await asyncio.sleep(interval)
+                if not self.is_on:
+                    continue
+
+                main = ws is self.connection
+                if main:
+                    last_alive = max(last_alive, self._last_inbound)
+                    if loop.time() - self._last_inbound < interval:
+                        misses = 0
+                        interval = min(interval * 2, self.ping_interval_max)
+                        continue
+
+                start = loop.time()
+                ping_waiter = await ws.ping()
+                try:
+                    # a late pong still acknowledges the ping for the next rounds
+                    await asyncio.wait_for(asyncio.shield(ping_waiter), timeout=self._ping_wait())
+                except asyncio.TimeoutError:
+                    misses += 1
+                    if misses >= PING_MAX_MISSES or loop.time() - last_alive >= self.ping_timeout:
+                        return
+                    interval = self.ping_interval
+                    continue
+
+                last_alive = loop.time()
+                misses = 0
+                if main:
+                    self._update_ping_rtt(last_alive - start)
+                interval = min(interval * 2, self.ping_interval_max)
         except (
-            asyncio.TimeoutError,
             asyncio.CancelledError,
             websockets.exceptions.ConnectionClosedError,
             websockets.exceptions.ConnectionClosedOK,
         ):
             pass
 
+    async def input_ping_handler(self, inputws):
+        """Check the liveness of the input socket, close and drop it when it's considered dead."""
+        await self.ping_handler(inputws)
+        # the next input batch reopens the socket instead of reusing a half-open one
+        if self.input_connection is inputws:
+            self.input_connection = None
+        await inputws.close()
+
     async def callback_handler(self, queue, callback, future):
         try:
             while True:
@@ -353,25 +1096,35 @@ class WebOsClient:
             pass
 
     async def consumer_handler(self, ws):
-        callback_queues = {}
         callback_tasks = {}
+        loop = asyncio.get_running_loop()
 
         try:
             async for raw_msg in ws:
+                self._last_inbound = loop.time()
                 if self.callbacks or self.futures:
-                    msg = json.loads(raw_msg)
+                    # skip the frames nobody waits for without parsing them
+                    uid = frame_id(raw_msg)
+                    if uid is not FRAME_ID_UNKNOWN and uid not in self.callbacks and uid not in self.futures:
+                        continue
+
+                    msg = self.codec.loads(raw_msg)
                     uid = msg.get("id")
                     callback = self.callbacks.get(uid)
                     future = self.futures.get(uid)
 
+                    if self.metrics is not None:
+                        self._metrics_received(uid, msg, len(raw_msg), future is None or future.done())
+
                     if callback is not None:
+                        queue = self.subscription_queues.get(uid)
+                        if queue is None:
+                            queue = self.subscription_queues[uid] = SubscriptionQueue(None)
                         if uid not in callback_tasks:
-                            queue = asyncio.Queue()
-                            callback_queues[uid] = queue
                             callback_tasks[uid] = asyncio.create_task(
                                 self.callback_handler(queue, callback, future)
                             )
-                        callback_queues[uid].put_nowait(msg)
+                        await queue.put(msg)
                     elif future is not None and not future.done():
                         self.futures[uid].set_result(msg)
 
@@ -489,6 +1242,8 @@ class WebOsClient:
     async def register_state_update_callback(self, callback):
         self.state_update_callbacks.append(callback)
         if self.doStateUpdate:
+            if self._dispatched_state is None:
+                self._dispatched_state = self._state_snapshot()
             await callback(self)
 
     def unregister_state_update_callback(self, callback):
@@ -499,6 +1254,29 @@ class WebOsClient:
         self.state_update_callbacks = []
 
     async def do_state_update_callbacks(self):
+        """Call the state update callbacks, updates are coalesced within state_update_delay if it's set."""
+        if self.state_update_delay is None:
+            await self._dispatch_state_update(force=True)
+        elif self._state_update_task is None:
+            self._state_update_task = asyncio.create_task(self._delayed_state_update())
+
+    async def _delayed_state_update(self):
+        try:
+            await asyncio.sleep(self.state_update_delay)
+        finally:
+            self._state_update_task = None
+        await self._dispatch_state_update()
+
+    async def _dispatch_state_update(self, force=False):
+        """Call the state update callbacks with changed_states set to the fields changed since the last call."""
+        state = self._state_snapshot()
+        last_state, self._dispatched_state = self._dispatched_state, state
+        self.changed_states = {
+            name for name, value in state.items() if last_state is None or last_state[name] != value
+        }
+        if not self.changed_states and not force:
+            return
+
         callbacks = set()
         for callback in self.state_update_callbacks:
             callbacks.add(callback(self))
@@ -510,7 +1288,7 @@ class WebOsClient:
         self._power_state = {"state": payload.get("state", "Unknown")}
 
         if not self.is_on:
-            await self.disconnect()
+            await self._close_connection()
         elif self.state_update_callbacks and self.doStateUpdate:
             await self.do_state_update_callbacks()
 
@@ -519,10 +1297,7 @@ class WebOsClient:
         self._current_appId = appId
 
         if self._channels is None:
-            try:
-                await self.subscribe_channels(self.set_channels_state)
-            except PyLGTVCmdException:
-                pass
+            await self._subscribe_channels_state()
 
         if appId == "com.webos.app.livetv" and self._current_channel is None:
             try:
@@ -602,6 +1377,8 @@ class WebOsClient:
             await self.do_state_update_callbacks()
 
     async def set_picture_settings_state(self, picture_settings):
+        self.settings_cache.update("picture", picture_settings, subscribed=True)
+
         if isinstance(self._picture_settings, dict) and isinstance(picture_settings, dict):
             self._picture_settings.update(picture_settings)
         else:
@@ -621,42 +1398,147 @@ class WebOsClient:
         if payload is None:
             payload = {}
 
-        message = {
-            "id": uid,
-            "type": request_type,
-            "uri": f"ssap://{uri}",
-            "payload": payload,
-        }
-
         if self.connection is None:
             raise PyLGTVCmdException("Not connected, can't execute command.")
 
-        await self.connection.send(json.dumps(message))
+        frame = None
+        if self.frame_cache is not None:
+            frame = self.frame_cache.frame(request_type, uri, payload, uid)
+
+        if frame is None:
+            message = {
+                "id": uid,
+                "type": request_type,
+                "uri": f"ssap://{uri}",
+                "payload": payload,
+            }
+            frame = self.codec.dumps(message)
+
+        if self.metrics is not None:
+            self._metrics_sent(uid, uri, frame)
+
+        await self._send_frame(frame)
+
+    async def _send_frame(self, frame, ws=None):
+        """Send an already serialized JSON message (str or bytes-like) as a text frame."""
+        ws = ws or self.connection
+        if ws is None:
+            raise PyLGTVCmdException("Not connected, can't execute command.")
+
+        if isinstance(frame, str):
+            await ws.send(frame)
+            return
 
-    async def request(self, uri, payload=None, cmd_type="request", uid=None):
-        """Send a request and wait for response."""
+        if self._send_text_bytes is None:
+            # websockets >= 14 can send bytes as text frame without decoding them first
+            self._send_text_bytes = "text" in inspect.signature(ws.send).parameters
+
+        if self._send_text_bytes:
+            await ws.send(frame, text=True)
+        else:
+            await ws.send(bytes(frame).decode())
+
+    async def request(self, uri, payload=None, cmd_type="request", uid=None, timeout=None):
+        """Send a request and wait for response.
+
+        timeout (seconds) defaults to timeout_request of the client, it's shortened to the
+        deadline of an enclosing request_deadline() block.
+        """
         if uid is None:
             uid = self.command_count
             self.command_count += 1
 
+        timeout = self._request_timeout(timeout)
+        return await self._request_sent(uid, self.command(cmd_type, uri, payload, uid), timeout)
+
+    async def _request_frame(self, frame, uid, timeout=None, uri=None):
+        """Send a prebuilt frame with id uid (of uri, used for the metrics) and wait for response."""
+        async def send():
+            if self.metrics is not None and uri is not None:
+                self._metrics_sent(uid, uri, frame)
+            await self._send_frame(frame)
+
+        return await self._request_sent(uid, send(), self._request_timeout(timeout))
+
+    def _metrics_sent(self, uid, uri, frame):
+        self.metrics.request_sent(uri, len(frame))
+        # fire and forget commands (e.g. power_off) aren't waited for
+        if uid in self.futures:
+            self._metrics_pending[uid] = (uri, time.perf_counter())
+
+    def _metrics_failed(self, uid, error):
+        pending = self._metrics_pending.pop(uid, None)
+        if pending is not None:
+            self.metrics.request_failed(pending[0], error)
+
+    def _metrics_received(self, uid, msg, size, subscription_message):
+        """Record a routed frame, the first frame of a subscription is the response of subscribe()."""
+        pending = self._metrics_pending.pop(uid, None)
+        if pending is None:
+            queue = self.subscription_queues.get(uid)
+            if subscription_message and queue is not None:
+                self.metrics.subscription_message(queue.uri, size)
+            return
+
+        uri, start = pending
+        error = None
+        payload = msg.get("payload") or {}
+        if msg.get("type") == "error":
+            error = str(msg.get("error", "")).split(" ", 1)[0] or "error"
+        elif not (payload.get("returnValue") or payload.get("subscribed")):
+            error = "failed"
+        self.metrics.response_received(uri, time.perf_counter() - start, size, error)
+
+    def _request_timeout(self, timeout=None):
+        """Return the timeout of a request from the argument, the client default and the current deadline."""
+        if timeout is None:
+            timeout = self.timeout_request
+
+        deadline = REQUEST_DEADLINE.get()
+        if deadline is not None:
+            remaining = max(0, deadline - asyncio.get_running_loop().time())
+            timeout = remaining if timeout is None else min(timeout, remaining)
+
+        return timeout
+
+    async def _request_sent(self, uid, send, timeout=None):
+        if timeout is not None and timeout <= 0:
+            send.close()
+            raise PyLGTVRequestTimeoutError(f"Request {uid} not sent, deadline already expired.")
+
         res = asyncio.Future()
         self.futures[uid] = res
 
         try:
-            await self.command(cmd_type, uri, payload, uid)
+            await send
         except (asyncio.CancelledError, PyLGTVCmdException):
             del self.futures[uid]
             raise
 
         try:
-            response = await res
+            if timeout is None:
+                response = await res
+            else:
+                response = await asyncio.wait_for(res, timeout)
+        except asyncio.TimeoutError:
+            if self.futures.get(uid) is res:
+                del self.futures[uid]
+            if self.metrics is not None:
+                self._metrics_failed(uid, "timeout")
+            raise PyLGTVRequestTimeoutError(f"Request {uid} timed out after {timeout:.3f} seconds.") from None
         except asyncio.CancelledError:
             if uid in self.futures:
                 del self.futures[uid]
+            if self.metrics is not None:
+                self._metrics_failed(uid, "cancelled")
             raise
 
         del self.futures[uid]
 
+        return self._response_payload(response)
+
+    def _response_payload(self, response):
+        """Validate a response message and return its payload."""
         payload = response.get("payload")
         if payload is None:
             raise PyLGTVCmdException(f"Invalid request response {response}")
@@ -676,29 +1558,137 @@ class WebOsClient:
 
         return payload
 
-    async def subscribe(self, callback, uri, payload=None):
-        """Subscribe to updates."""
+    async def request_many(self, requests, return_exceptions=True, timeout=None):
+        """Send multiple requests back-to-back and wait for all the responses.
+
+        requests is a list of uris or (uri, payload) tuples. All the frames are written
+        before any response is awaited, so the whole batch costs about one round-trip.
+        Results are returned in the same order, failed requests are returned as exceptions
+        unless return_exceptions is False, then the first failure is raised.
+        timeout is one deadline for the whole batch, requests without response by then
+        fail with PyLGTVRequestTimeoutError.
+        """
+        if self.connection is None:
+            raise PyLGTVCmdException("Not connected, can't execute command.")
+
+        timeout = self._request_timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            raise PyLGTVRequestTimeoutError("Requests not sent, deadline already expired.")
+
+        pending = []
+        for item in requests:
+            uri, payload = (item, None) if isinstance(item, str) else item
+            uid = self.command_count
+            self.command_count += 1
+            res = asyncio.Future()
+            self.futures[uid] = res
+            pending.append((uid, uri, payload, res))
+
+        try:
+            for uid, uri, payload, res in pending:
+                await self.command("request", uri, payload, uid)
+
+            if pending:
+                await asyncio.wait([res for _, _, _, res in pending], timeout=timeout)
+        finally:
+            for uid, _, _, res in pending:
+                if self.futures.get(uid) is res:
+                    del self.futures[uid]
+
+        results = []
+        for uid, _, _, res in pending:
+            if not res.done():
+                res.cancel()
+                if self.metrics is not None:
+                    self._metrics_failed(uid, "timeout")
+                response = PyLGTVRequestTimeoutError(f"Request {uid} timed out after {timeout:.3f} seconds.")
+            elif res.cancelled():
+                response = asyncio.CancelledError()
+            else:
+                response = res.result()
+
+            if not isinstance(response, BaseException):
+                try:
+                    response = self._response_payload(response)
+                except PyLGTVCmdException as ex:
+                    response = ex
+
+            if isinstance(response, BaseException) and not return_exceptions:
+                raise response
+            results.append(response)
+
+        return results
+
+    def subscription_stats(self):
+        """Return uid -> uri, queue policy, current depth and counters of the active subscriptions."""
+        return {
+            uid: {"uri": queue.uri, "policy": queue.policy, "maxsize": queue.maxsize, "depth": len(queue), **queue.stats}
+            for uid, queue in self.subscription_queues.items()
+        }
+
+    def pipeline(self, timeout=None):
+        """Return a context manager that collects requests and sends them with request_many on exit."""
+        return RequestPipeline(self, timeout)
+
+    def pointer_stream(self, rate=60):
+        """Return a PointerStream sending at most rate pointer frames per second."""
+        return PointerStream(self, rate)
+
+    async def subscribe(self, callback, uri, payload=None, queue_size=None, queue_policy=None):
+        """Subscribe to updates.
+
+        The messages are queued for the callback in a SubscriptionQueue of queue_size with
+        queue_policy, defaults to subscription_queue_size and subscription_queue_policy of
+        the client, or conflate for full state subscriptions if conflate_states is set.
+        The block policy can only be chosen here, its callback must not send requests.
+        """
+        if queue_size is None:
+            queue_size = self.subscription_queue_size
+        if queue_policy is None:
+            queue_policy = self.subscription_queue_policy
+            if self.conflate_states and uri in CONFLATE_STATE_URIS:
+                queue_policy = "conflate"
+        queue = SubscriptionQueue(uri, queue_size, queue_policy)
+
         uid = self.command_count
         self.command_count += 1
         self.callbacks[uid] = callback
+        self.subscription_queues[uid] = queue
 
         try:
-            return await self.request(
+            res = await self.request(
                 uri, payload=payload, cmd_type="subscribe", uid=uid
             )
         except Exception:
             del self.callbacks[uid]
+            self.subscription_queues.pop(uid, None)
             raise
 
-    async def input_command(self, message):
-        inputws = None
-        try:
+        self.subscriptions[uid] = (callback, uri, payload)
+        return res
+
+    async def input_socket(self):
+        """Return the open pointer input socket, (re)open it if it's missing or closed."""
+        async with self._input_lock:
+            inputws = self.input_connection
+            if inputws is not None:
+                if inputws.state.name == "OPEN":
+                    return inputws
+                self.input_connection = None
+                await inputws.close()
+
+            if self.connection is None:
+                raise PyLGTVCmdException("Not connected, can't execute command.")
+
             # open additional connection needed to send button commands
             # the url is dynamically generated and returned from the ep.INPUT_SOCKET
             # endpoint on the main connection
-            if self.input_connection is None:
-                sockres = await self.request(ep.INPUT_SOCKET)
-                inputsockpath = sockres.get("socketPath")
+            sockres = await self.request(ep.INPUT_SOCKET)
+            inputsockpath = sockres.get("socketPath")
+            if not inputsockpath:
+                raise PyLGTVCmdException(f"Invalid input socket response {sockres}")
+
+            try:
                 inputws = await asyncio.wait_for(
                     websockets.connect(
                         inputsockpath,
@@ -708,20 +1698,41 @@ class WebOsClient:
                     ),
                     timeout=self.timeout_connect,
                 )
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as ex:
+                raise PyLGTVCmdException(f"Couldn't open input socket: {ex!r}") from ex
 
-                if self.ping_interval is not None and self.ping_timeout is not None:
-                    self.handler_tasks.add(asyncio.create_task(self.ping_handler(inputws)))
+            if self.ping_interval is not None and self.ping_timeout is not None:
+                ping_task = asyncio.create_task(self.input_ping_handler(inputws))
+                ping_task.add_done_callback(self.handler_tasks.discard)
+                self.handler_tasks.add(ping_task)
 
-                self.input_connection = inputws
+            self.input_connection = inputws
+            return inputws
 
-            if self.input_connection is None:
-                raise PyLGTVCmdException("Couldn't execute input command.")
+    async def input_command(self, message):
+        """Send a message on the pointer input socket."""
+        await self.send_input_messages([message])
 
-            await self.input_connection.send(message)
+    async def send_input_messages(self, messages, delay=None):
+        """Send messages on the pointer input socket back-to-back, or delay seconds apart.
 
-        except Exception as ex:
-            if not self.connect_result.done():
-                self.connect_result.set_exception(ex)
+        The socket parses one record per frame, so every message is its own frame, but they are
+        written without waiting for each other. If the socket turns out to be closed, it's
+        reopened once and the remaining messages are sent on the new one.
+        """
+        sent = 0
+        for attempt in range(2):
+            inputws = await self.input_socket()
+            try:
+                while sent < len(messages):
+                    if delay and sent:
+                        await asyncio.sleep(delay)
+                    await inputws.send(messages[sent])
+                    sent += 1
+                return
+            except websockets.exceptions.ConnectionClosed as ex:
+                if attempt:
+                    raise PyLGTVCmdException(f"Couldn't execute input command: {ex!r}") from ex
 
     # high level request handling
 
@@ -735,11 +1746,32 @@ class WebOsClient:
         message = f"type:button\nname:{name}\n\n"
         await self.input_command(message)
 
+    async def send_buttons(self, names, delay=None, checkValid=True):
+        """Send button press commands, e.g. ["DOWN", "DOWN", "ENTER"], delay seconds apart."""
+        names = [str(name) for name in names]
+        if checkValid:
+            for name in names:
+                if name not in btn.BUTTONS:
+                    raise ValueError(
+                        f"button {name} is not valid, use checkValid=False to try a new one"
+                    )
+
+        await self.send_input_messages([f"type:button\nname:{name}\n\n" for name in names], delay)
+
     async def move(self, dx, dy, down=0):
         """Send cursor move command."""
         message = f"type:move\ndx:{dx}\ndy:{dy}\ndown:{down}\n\n"
         await self.input_command(message)
 
+    async def move_path(self, path, down=0, delay=None):
+        """Send cursor move commands of a list of (dx, dy) or (dx, dy, down) steps, delay seconds apart."""
+        messages = []
+        for step in path:
+            dx, dy, step_down = step if len(step) == 3 else (*step, down)
+            messages.append(f"type:move\ndx:{dx}\ndy:{dy}\ndown:{step_down}\n\n")
+
+        await self.send_input_messages(messages, delay)
+
     async def click(self):
         """Send cursor click command."""
         message = f"type:click\n\n"
@@ -1106,22 +2138,82 @@ class WebOsClient:
         # set desired action for click, fail and close
         # for redundancy/robustness
 
+        transaction = SETTINGS_TRANSACTION.get()
+        if transaction is not None and transaction.client is self:
+            transaction.queue(uri, params)
+            return None
+
+        try:
+            ret = await self.request(ep.CREATE_ALERT, self._luna_alert_payload(uri, params))
+            alertId = ret.get("alertId")
+            if alertId is None:
+                raise PyLGTVCmdException("Invalid alertId")
+
+            res = await self.request(ep.CLOSE_ALERT, payload={"alertId": alertId})
+        except BaseException:
+            self._settings_written(uri, params, False)
+            raise
+
+        self._settings_written(uri, params)
+        return res
+
+    def _settings_written(self, uri, params, ok=True):
+        """Keep the settings cache in line with the settings writes, whichever method made them."""
+        if uri == ep.LUNA_SET_SYSTEM_SETTINGS and isinstance(params, dict):
+            self.settings_cache.written(params, ok)
+
+    @staticmethod
+    def _luna_alert_payload(uri, params):
         lunauri = f"luna://{uri}"
 
         buttons = [{"label": "", "onClick": lunauri, "params": params}]
-        payload = {
+        return {
             "message": " ",
             "buttons": buttons,
             "onclose": {"uri": lunauri, "params": params},
             "onfail": {"uri": lunauri, "params": params},
         }
 
-        ret = await self.request(ep.CREATE_ALERT, payload)
-        alertId = ret.get("alertId")
-        if alertId is None:
-            raise PyLGTVCmdException("Invalid alertId")
+    async def luna_requests(self, calls):
+        """Make multiple luna api calls of (uri, params) tuples, the alerts are created and closed with request_many.
+
+        If an alert can't be created, the ones which were created are still closed (so they don't
+        stay open on the TV, their calls are made) and then the first error is raised.
+        """
+        try:
+            created = await self.request_many(
+                [(ep.CREATE_ALERT, self._luna_alert_payload(uri, params)) for uri, params in calls],
+            )
+            error = next((ret for ret in created if isinstance(ret, BaseException)), None)
+            alertIds = [None if isinstance(ret, BaseException) else ret.get("alertId") for ret in created]
+            if error is None and None in alertIds:
+                error = PyLGTVCmdException("Invalid alertId")
+
+            if error is not None:
+                opened = [alertId for alertId in alertIds if alertId is not None]
+                if opened:
+                    await self.request_many([(ep.CLOSE_ALERT, {"alertId": alertId}) for alertId in opened])
+                raise error
+
+            res = await self.request_many(
+                [(ep.CLOSE_ALERT, {"alertId": alertId}) for alertId in alertIds], return_exceptions=False
+            )
+        except BaseException:
+            for uri, params in calls:
+                self._settings_written(uri, params, False)
+            raise
 
-        return await self.request(ep.CLOSE_ALERT, payload={"alertId": alertId})
+        for uri, params in calls:
+            self._settings_written(uri, params)
+        return res
+
+    async def apply_settings(self, category, settings, current_app=None):
+        """Set the system settings of category which differ from the cached values (see SettingsCache), return the written ones."""
+        return await self.settings_cache.apply(category, settings, current_app)
+
+    def settings_transaction(self, pipelined=False):
+        """Return a SettingsTransaction, luna writes in its block are merged and sent on exit."""
+        return SettingsTransaction(self, pipelined)
 
     async def input_button(self):
         """Input button."""
@@ -2444,6 +3536,52 @@ class WebOsClient:
         res = await self.request(ep.GET_SYSTEM_SETTINGS, payload=payload)
         return self.__output_result(res, jsonOutput)
 
+    async def get_system_settings_bulk(self, categories=None, configs=None, max_concurrent=4, jsonOutput=False):
+        """Get the system settings of many categories and optionally configs concurrently.
+
+        categories is a dict of category -> keys, all the known keys of every category
+        (SYSTEM_SETTINGS_KEYS) are read by default. configs is a list of config keys for
+        get_configs, e.g. ["tv.model.*", "tv.hw.*"], every key is requested separately.
+        At most max_concurrent requests are in flight at once.
+
+        Returns {"settings": {category: settings}, "configs": {key: value}, "errors": {category: message},
+        "config_errors": {key: message}}, a failed category (or config key) is only reported in errors
+        (or config_errors), the rest is still returned.
+        """
+        if categories is None:
+            categories = SYSTEM_SETTINGS_KEYS
+        if max_concurrent < 1:
+            raise ValueError(f"Invalid max_concurrent {max_concurrent}, must be at least 1.")
+
+        semaphore = asyncio.Semaphore(max_concurrent)
+
+        async def fetch(uri, payload):
+            async with semaphore:
+                return await self.request(uri, payload=payload)
+
+        names = []
+        coros = []
+        for category, keys in categories.items():
+            names.append(("settings", category))
+            coros.append(fetch(ep.GET_SYSTEM_SETTINGS, {"category": category, "keys": list(keys)}))
+        for key in configs or []:
+            names.append(("configs", key))
+            coros.append(fetch(ep.GET_CONFIGS, {"configNames": [key]}))
+
+        result = {"settings": {}, "configs": {}, "errors": {}, "config_errors": {}}
+        for (kind, name), res in zip(names, await asyncio.gather(*coros, return_exceptions=True)):
+            if isinstance(res, BaseException):
+                if not isinstance(res, Exception):
+                    raise res
+                errors = result["errors"] if kind == "settings" else result["config_errors"]
+                errors[name] = str(res) or type(res).__name__
+            elif kind == "settings":
+                result["settings"][name] = res.get("settings", {})
+            else:
+                result["configs"].update(res.get("configs", {}))
+
+        return self.__output_result(result, jsonOutput)
+
     async def get_picture_settings(
         self, keys=["contrast", "backlight", "brightness", "color"], jsonOutput=False
     ):
@@ -2509,11 +3647,30 @@ class WebOsClient:
         async def get_calibration_data(self, command, shape, filename=""):
             if command not in [cal.GET_GAMMA_2_2_TRANSFORM, cal.GET_GAMMA_0_45_TRANSFORM, cal.GET_3BY3_GAMUT_DATA, cal.GET_HDR_3BY3_GAMUT_DATA, cal.GET_1D_LUT, cal.GET_3D_LUT]:
                 raise PyLGTVCmdException(f"Invalid Get Calibration command {command}.")
-            if filename and filename.split(".")[-1].lower() not in ["1dlut", "matrix", "3dlut"]:
-                raise PyLGTVCmdException(f"Invalid Get Calibration file extension, must be: 1dlut or matrix or 3dlut.")
+            ext = filename.split(".")[-1].lower()
+            if filename and ext not in ["1dlut", "matrix", "3dlut", "blut"]:
+                raise PyLGTVCmdException(f"Invalid Get Calibration file extension, must be: 1dlut or matrix or 3dlut or blut.")
 
             response = await self.request(ep.GET_CALIBRATION, {"command": command})
+            data = self._decode_calibration_data(response, shape)
+
+            if filename and ext == "blut":
+                # backup numpy array into binary file
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, write_binary_lut_file, filename, data, self.calibration_chip_type(), self._calibration_picture_mode
+                )
+            elif filename:
+                # backup numpy array
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, backup_lut_into_file, filename, data
+                )
+            else:
+                # print the full numpy array
+                np.set_printoptions(threshold=np.inf)
+                return data if shape != (1, ) else data[0]
 
+        def _decode_calibration_data(self, response, shape):
+            """Decode the data of a GET_CALIBRATION response."""
             encodedData = response.get("data")
             dataCount = response.get("dataCount")
             dataType = response.get("dataType")
@@ -2525,18 +3682,16 @@ class WebOsClient:
             npType = getattr(np, type[0])
             data_bytes = base64.b64decode(encodedData.encode())
             deserialized_bytes = np.frombuffer(data_bytes, dtype=npType)
-            data = np.reshape(deserialized_bytes, newshape=shape)
+            data = np.reshape(deserialized_bytes, shape)
             self.validateCalibrationData(data, shape, npType, None, dataCount)
+            return data
 
-            if filename:
-                # backup numpy array
-                return await asyncio.get_running_loop().run_in_executor(
-                    None, backup_lut_into_file, filename, data
-                )
-            else:
-                # print the full numpy array
-                np.set_printoptions(threshold=np.inf)
-                return data if shape != (1, ) else data[0]
+        def calibration_chip_type(self):
+            """Return the chip type part of the model name (e.g. W22O) if it's available."""
+            model_name = (self._software_info or {}).get("model_name", "")
+            if model_name.startswith("HE_DTV_") and len(model_name) >= 11:
+                return model_name[7:11]
+            return None
 
         async def get_1d_en_2_2(self):
             return await self.get_calibration_data(cal.GET_GAMMA_2_2_TRANSFORM, (1, ))
@@ -2559,6 +3714,93 @@ class WebOsClient:
             lut3d_shape = (lut3d_size, lut3d_size, lut3d_size, 3)
             return await self.get_calibration_data(cal.GET_3D_LUT, lut3d_shape, filename)
 
+        def _calibration_snapshot_items(self):
+            items = [
+                ("1d_en_2_2", cal.GET_GAMMA_2_2_TRANSFORM, (1, )),
+                ("1d_en_0_45", cal.GET_GAMMA_0_45_TRANSFORM, (1, )),
+                ("3by3_gamut_data", cal.GET_3BY3_GAMUT_DATA, (3, 3)),
+                ("3by3_gamut_data_hdr", cal.GET_HDR_3BY3_GAMUT_DATA, (3, 3)),
+                ("1d_lut", cal.GET_1D_LUT, (3, 1024)),
+            ]
+            if self._software_info is not None:
+                self.calibration_support_info()
+                lut3d_size = self._calibration_info["lut3d"]
+                if lut3d_size:
+                    items.append(("3d_lut", cal.GET_3D_LUT, (lut3d_size, lut3d_size, lut3d_size, 3)))
+            return items
+
+        def _decode_calibration_snapshot(self, items, responses, metadata, filename):
+            data = {}
+            for (name, _, shape), response in zip(items, responses):
+                if isinstance(response, BaseException):
+                    metadata["errors"][name] = str(response) or type(response).__name__
+                    continue
+                try:
+                    data[name] = self._decode_calibration_data(response, shape)
+                except (PyLGTVCmdException, ValueError, TypeError) as ex:
+                    metadata["errors"][name] = str(ex)
+
+            if filename:
+                write_calibration_snapshot(filename, data, metadata)
+            return data
+
+        async def snapshot_calibration(self, filename=None):
+            """Read all the calibration data at once and optionally save them into a npz archive.
+
+            The GET_CALIBRATION requests are pipelined and decoded in a worker thread. Returns name -> array,
+            data that couldn't be read are left out and listed under errors in the archive metadata.
+            The 3D LUT is included only if software_info state is available.
+            """
+            items = self._calibration_snapshot_items()
+            responses = await self.request_many(
+                [(ep.GET_CALIBRATION, {"command": command}) for _, command, _ in items]
+            )
+            metadata = {
+                "bscpylgtv": __version__,
+                "model_name": (self._software_info or {}).get("model_name"),
+                "chip_type": self.calibration_chip_type(),
+                "picture_mode": self._calibration_picture_mode,
+                "errors": {},
+            }
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._decode_calibration_snapshot, items, responses, metadata, filename
+            )
+
+        async def restore_calibration(self, filename, picture_mode=None, color_space="bt2020"):
+            """Upload the data of a snapshot_calibration archive, return the names of the restored data.
+
+            The 3D LUT and the 3x3 color matrix are uploaded into the color_space (bt709 or bt2020) slots.
+            Calibration mode is started and ended around the uploads if picture_mode is specified.
+            """
+            if color_space not in ["bt709", "bt2020"]:
+                raise PyLGTVCmdException(f"Invalid color_space {color_space}, must be: bt709 or bt2020")
+
+            data, metadata = await asyncio.get_running_loop().run_in_executor(
+                None, read_calibration_snapshot, filename
+            )
+            uploads = [
+                ("1d_lut", self.upload_1d_lut),
+                ("1d_en_2_2", lambda value: self.set_1d_en_2_2(bool(value[0]))),
+                ("1d_en_0_45", lambda value: self.set_1d_en_0_45(bool(value[0]))),
+                ("3by3_gamut_data", getattr(self, f"set_3by3_gamut_data_{color_space}")),
+                ("3by3_gamut_data_hdr", self.set_3by3_gamut_data_hdr),
+                ("3d_lut", getattr(self, f"upload_3d_lut_{color_space}")),
+            ]
+
+            restored = []
+            if picture_mode is not None:
+                await self.start_calibration(picture_mode)
+            try:
+                for name, upload in uploads:
+                    if name in data:
+                        await upload(data[name])
+                        restored.append(name)
+            finally:
+                if picture_mode is not None:
+                    await self.end_calibration()
+
+            return restored
+
         async def calibration_request(self, command, data=None, dataOpt=1, picture_mode=None):
             # dataOpt: 0 - Apply, 1 - Apply and Save, 2 - Reset
             if dataOpt < 0 or dataOpt > 2:
@@ -2575,6 +3817,12 @@ class WebOsClient:
                 payload["picMode"] = picture_mode
 
             if data is not None:
+                if self.stream_calibration:
+                    payload["dataCount"] = data.size
+                    payload["dataType"] = CALIBRATION_TYPE_MAP[data.dtype.name]
+                    payload["dataOpt"] = dataOpt
+                    return await self.calibration_stream_request(payload, data)
+
                 payload["data"] = base64.b64encode(data.tobytes()).decode()
                 payload["dataCount"] = data.size
                 payload["dataType"] = CALIBRATION_TYPE_MAP[data.dtype.name]
@@ -2582,14 +3830,41 @@ class WebOsClient:
 
             return await self.request(ep.CALIBRATION, payload)
 
+        async def calibration_stream_request(self, payload, data):
+            """Send a calibration request with data encoded straight into the websocket frame.
+
+            The raw data isn't copied, its base64 form is written directly into the preallocated frame.
+            Bytes and time of the stages are stored in calibration_stats.
+            """
+            uid = self.command_count
+            self.command_count += 1
+            message = {"id": uid, "type": "request", "uri": f"ssap://{ep.CALIBRATION}", "payload": payload}
+
+            start = time.perf_counter()
+            raw = np.ascontiguousarray(data).reshape(-1)
+            frame = build_data_frame(message, raw)
+            encoded = time.perf_counter()
+            res = await self._request_frame(frame, uid, uri=ep.CALIBRATION)
+            done = time.perf_counter()
+
+            self.calibration_stats = {
+                "encode": {"bytes": raw.nbytes, "seconds": encoded - start},
+                "request": {"bytes": len(frame), "seconds": done - encoded},
+            }
+            return res
+
         async def start_calibration(self, picture_mode):
             if not any(picture_mode in ls for ls in [SDR_PICTURE_MODES, HDR10_PICTURE_MODES, DV_PICTURE_MODES]):
                 raise PyLGTVCmdException(f"Invalid picture_mode {picture_mode}.")
 
-            return await self.calibration_request(cal.CAL_START, None, 1, picture_mode)
+            res = await self.calibration_request(cal.CAL_START, None, 1, picture_mode)
+            self._calibration_picture_mode = picture_mode
+            return res
 
         async def end_calibration(self):
-            return await self.calibration_request(cal.CAL_END)
+            res = await self.calibration_request(cal.CAL_END)
+            self._calibration_picture_mode = None
+            return res
 
         async def set_ui_data(self, command, value):
             if command not in [cal.BACKLIGHT_UI_DATA, cal.CONTRAST_UI_DATA, cal.BRIGHTNESS_UI_DATA, cal.COLOR_UI_DATA]:
@@ -2639,9 +3914,13 @@ class WebOsClient:
                 lut = await asyncio.get_running_loop().run_in_executor(
                     None, read_1dlut_file, filename
                 )
+            elif ext == "blut":
+                lut = await asyncio.get_running_loop().run_in_executor(
+                    None, read_binary_lut_file, filename
+                )
             else:
                 raise ValueError(
-                    f"Unsupported file format {ext} for 1D LUT. Supported file formats are cal, cube and 1dlut."
+                    f"Unsupported file format {ext} for 1D LUT. Supported file formats are cal, cube, 1dlut and blut."
                 )
 
             return await self.upload_1d_lut(lut)
@@ -2700,17 +3979,23 @@ class WebOsClient:
         async def upload_3d_lut_from_file(self, command, filename):
             ext = filename.split(".")[-1].lower()
             if ext == "cube":
+                # cube files of other sizes are resampled to the size supported by the tv
+                self.check_calibration_support("lut3d", "3D LUT Upload")
                 lut = await asyncio.get_running_loop().run_in_executor(
-                    None, read_cube_file, filename
+                    None, read_cube_file, filename, self._calibration_info["lut3d"]
                 )
             elif ext == "3dlut":
                 self.check_calibration_support("lut3d", "3D LUT Upload")
                 lut = await asyncio.get_running_loop().run_in_executor(
                     None, read_3dlut_file, filename, self._calibration_info["lut3d"]
                 )
+            elif ext == "blut":
+                lut = await asyncio.get_running_loop().run_in_executor(
+                    None, read_binary_lut_file, filename
+                )
             else:
                 raise ValueError(
-                    f"Unsupported file format {ext} for 3D LUT. Supported file formats are cube and 3dlut."
+                    f"Unsupported file format {ext} for 3D LUT. Supported file formats are cube, 3dlut and blut."
                 )
 
             return await self.upload_3d_lut(command, lut)
@@ -2769,9 +4054,13 @@ class WebOsClient:
                 lut = await asyncio.get_running_loop().run_in_executor(
                     None, read_3by3_gamut_file, filename
                 )
+            elif ext == "blut":
+                lut = await asyncio.get_running_loop().run_in_executor(
+                    None, read_binary_lut_file, filename
+                )
             else:
                 raise ValueError(
-                    f"Unsupported file format {ext} for 3by3 gamut. Supported file format is matrix."
+                    f"Unsupported file format {ext} for 3by3 gamut. Supported file formats are matrix and blut."
                 )
 
             method = getattr(self, methodName)
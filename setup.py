@@ -28,6 +28,10 @@ setup(
     keywords=["webos", "tv"],
     classifiers=[],
     entry_points={
-        "console_scripts": ["bscpylgtvcommand=bscpylgtv.utils:bscpylgtvcommand"]
+        "console_scripts": [
+            "bscpylgtvcommand=bscpylgtv.utils:bscpylgtvcommand",
+            "bscpylgtvsnapshot=bscpylgtv.utils:bscpylgtvsnapshot",
+            "bscpylgtvmergesettings=bscpylgtv.utils:bscpylgtvmergesettings",
+        ]
     },
 )
@@ -7,6 +7,7 @@ from bscpylgtv import endpoints as ep
 from bscpylgtv import cal_commands as cal
 from bscpylgtv.exceptions import PyLGTVCmdException
 from bscpylgtv.constants import DV_CONFIG_FILENAME
+from bscpylgtv.lut_tools import read_binary_lut_file, read_binary_lut_header, resample_lut_3d, unity_lut_3d
 
 TEST_DIR_DATA = "data"
 TEST_DIR_EXPECTED = "expected"
@@ -135,6 +136,39 @@ class TestWebOsClientCalibration():
 
 
 
+    data_binary_lut_file = [
+        ( "HE_DTV_W18H",    "1dlut_00.txt",         3072,   "1d_lut",           "upload_1d_lut_from_file",                  cal.UPLOAD_1D_LUT,          (3, 1024) ),
+        ( "HE_DTV_W18H",    "3dlut_17pt_00.txt",    14739,  "3d_lut",           "upload_3d_lut_bt709_from_file",            cal.UPLOAD_3D_LUT_BT709,    (17, 17, 17, 3) ),
+        ( "HE_DTV_W22O",    "3dlut_33pt_00.txt",    107811, "3d_lut",           "upload_3d_lut_bt2020_from_file",           cal.UPLOAD_3D_LUT_BT2020,   (33, 33, 33, 3) ),
+    ]
+
+    @pytest.mark.parametrize("model,fileName,count,getter,uploader,command,shape", data_binary_lut_file)
+    async def test_binary_lut_file(self, tmp_path, mocker, model, fileName, count, getter, uploader, command, shape):
+        currentDir = os.path.dirname(os.path.realpath(__file__))
+        with open(os.path.join(currentDir, TEST_DIR_DATA, fileName)) as f:
+                dataLut = f.read()
+        mocker.patch('bscpylgtv.WebOsClient.request', return_value={"data": dataLut, "dataCount": count, "dataType": "unsigned integer16"})
+
+        client = await WebOsClient.create("x", states=["software_info"], client_key="x")
+        client._software_info = {"model_name" : model}
+        backupFile = str(tmp_path / "backup.blut")
+
+        await client.start_calibration("expert1")
+        assert await getattr(client, f'get_{getter}')(backupFile) is True
+
+        header = read_binary_lut_header(backupFile)
+        assert (header["shape"], header["chip_type"], header["picture_mode"]) == (list(shape), model[7:11], "expert1")
+        assert header["offset"] % 64 == 0
+        lut = read_binary_lut_file(backupFile, shape, np.uint16)
+        assert isinstance(lut, np.memmap)
+
+        client.request.reset_mock()
+        await getattr(client, uploader)(backupFile)
+        payload = client.request.call_args[0][1]
+        assert (payload["command"], payload["data"], payload["dataCount"]) == (command, dataLut, count)
+
+
+
     data_get_1d_lut = [
         ( "foo.bar",    cal.GET_1D_LUT, "1dlut_00.txt", 3072,   "unsigned integer16",   "1dlut_00.cube",    -2 ),
         ( "",           cal.GET_1D_LUT, "1dlut_00.txt", 3072,   "foo",                  "1dlut_00.cube",    -1 ),
@@ -505,11 +539,14 @@ class TestWebOsClientCalibration():
         ( "HE_DTV_W18H",   "3dlut.cal",         None,                       None,                   None,   None,   -4 ),
 
         ( "HE_DTV_W18H",   "3dlut_11.cube",     None,                       None,                   None,   None,   -3 ),
+        ( "HE_DTV_W18H",   "3dlut_15.cube",     None,                       None,                   None,   None,   -3 ),
         ( "HE_DTV_W18H",   "3dlut_12.cube",     None,                       None,                   None,   None,   -2 ),
         ( "HE_DTV_W18H",   "3dlut_13.cube",     None,                       None,                   None,   None,   -1 ),
-        ( "HE_DTV_W18H",   "3dlut_14.cube",     cal.UPLOAD_3D_LUT_BT709,    None,                   None,   None,   0 ),
+        ( "HE_DTV_W18H",   "3dlut_14.cube",     cal.UPLOAD_3D_LUT_BT709,    None,                   14739,  1,      1 ),
 
         ( "HE_DTV_W18H",   "3dlut_17pt.cube",   cal.UPLOAD_3D_LUT_BT709,    "3dlut_17pt_01.txt",    14739,  1,      1 ),
+        ( "HE_DTV_W18H",   "3dlut_17pt_crlf.cube", cal.UPLOAD_3D_LUT_BT709, "3dlut_17pt_01.txt",    14739,  1,      1 ),
+        ( "HE_DTV_W18H",   "3dlut_17pt_cr.cube", cal.UPLOAD_3D_LUT_BT709,   "3dlut_17pt_01.txt",    14739,  1,      1 ),
         ( "HE_DTV_W22O",   "3dlut_33pt.cube",   cal.UPLOAD_3D_LUT_BT2020,   "3dlut_33pt_01.txt",    107811, 1,      1 ),
         ( "HE_DTV_W18H",   "3dlut_17pt.3dlut",  cal.UPLOAD_3D_LUT_BT2020,   "3dlut_17pt_01.txt",    14739,  1,      1 ),
         ( "HE_DTV_W22O",   "3dlut_33pt.3dlut",  cal.UPLOAD_3D_LUT_BT709,    "3dlut_33pt_01.txt",    107811, 1,      1 ),
@@ -525,7 +562,12 @@ class TestWebOsClientCalibration():
 
         if expected > 0:
             await client.upload_3d_lut_from_file(command, os.path.join(currentDir, TEST_DIR_DATA, fileName))
-            
+
+            if dataFile is None:
+                # resampled to the supported size
+                assert client.request.call_args[0][1]["dataCount"] == dataCount
+                return
+
             with open(os.path.join(currentDir, TEST_DIR_EXPECTED, dataFile)) as f:
                 data = f.read()
 
@@ -580,6 +622,35 @@ class TestWebOsClientCalibration():
 
 
 
+    data_upload_3d_lut_from_file_resampled = [
+        ( "HE_DTV_W18H",   65,  17,  "tetrahedral" ),
+        ( "HE_DTV_W22O",   65,  33,  "tetrahedral" ),
+        ( "HE_DTV_W22O",   17,  33,  "trilinear" ),
+    ]
+
+    @pytest.mark.parametrize("model,size,lut3d_size,method", data_upload_3d_lut_from_file_resampled)
+    async def test_upload_3d_lut_from_file_resampled(self, mocker, tmp_path, model, size, lut3d_size, method):
+        mocker.patch('bscpylgtv.WebOsClient.upload_3d_lut')
+
+        client = await WebOsClient.create("x", states=["software_info"], client_key="x")
+        client._software_info = {"model_name" : model}
+
+        # identity cube, interpolation is exact for it
+        grid = np.linspace(0.0, 1.0, size)
+        lut = np.flip(np.stack(np.meshgrid(grid, grid, grid, indexing="ij"), axis=-1), axis=-1)
+        fileName = tmp_path / "identity.cube"
+        with open(fileName, "w") as f:
+            f.write(f"LUT_3D_SIZE {size}\n")
+            np.savetxt(f, lut.reshape(-1, 3), fmt="%.9f")
+
+        await client.upload_3d_lut_from_file(cal.UPLOAD_3D_LUT_BT709, str(fileName))
+
+        data = client.upload_3d_lut.call_args[0][1]
+        assert np.array_equal(data, unity_lut_3d(lut3d_size))
+        assert np.allclose(resample_lut_3d(lut, lut3d_size, method), unity_lut_3d(lut3d_size) / 4096.0, atol=1 / 4096.0)
+
+
+
     data_set_1d_en_2_2_0_45_1d_lut_3by3_gamut = [
         ( "",     "1d_en_2_2",    None,                           None,   None,   None,   0 ),
         ( "x",    "1d_en_2_2",    None,                           None,   None,   None,   0 ),
@@ -1,5 +1,17 @@
+import argparse
+import io
+import json
+import socket
 import pytest
 from bscpylgtv import WebOsClient
+from bscpylgtv.codec import CODECS, available_codecs, get_codec
+from bscpylgtv.exceptions import PyLGTVCmdException
+from bscpylgtv.frame_tools import FrameCache
+from bscpylgtv.metrics import ClientMetrics, Histogram, StatsdSink, render_openmetrics
+from bscpylgtv.settings_tools import iter_stacked_json, merge_default_settings, merge_settings_files
+from bscpylgtv.snapshot import SettingsSnapshot, category_hash
+from bscpylgtv.utils import snapshot_runloop
+from bscpylgtv.webos_client import FRAME_ID_UNKNOWN, frame_id
 
 
 @pytest.mark.asyncio
@@ -70,3 +82,209 @@ class TestWebOsClientLite():
 
         assert cal_info == client._calibration_info
 
+
+
+
+    data_frame_id = [
+        ( '{"type": "response", "id": 12, "payload": {"id": 3}}',                       12 ),
+        ( '{"id":-1,"type":"response","payload":{}}',                                  -1 ),
+        ( '{"type": "response", "id": "hello", "payload": {"id": "x"}}',                "hello" ),
+        ( '{"type": "error", "id": 7, "error": "500 \\"id\\": 3", "payload": {}}',    7 ),
+        ( '{"type": "response", "payload": {"id": 3}, "id": 12}',                       None ),
+        ( '{"type": "response", "id": "a\\"b", "payload": {}}',                         None ),
+        ( '{"type": "response", "id": 1.5, "payload": {}}',                             None ),
+        ( b'{"type": "response", "id": 12, "payload": {}}',                             None ),
+    ]
+
+    @pytest.mark.parametrize("raw_msg,expected", data_frame_id)
+    async def test_frame_id(self, raw_msg, expected):
+        uid = frame_id(raw_msg)
+
+        if expected is None:
+            assert uid is FRAME_ID_UNKNOWN
+        else:
+            assert uid == expected
+
+
+
+    data_get_codec = [
+        ( "foo",        -1 ),
+        ( None,         1 ),
+        ( "auto",       1 ),
+        ( "json",       1 ),
+        ( "orjson",     1 ),
+        ( "msgspec",    1 ),
+        ( "ujson",      1 ),
+    ]
+
+    @pytest.mark.parametrize("name,expected", data_get_codec)
+    async def test_get_codec(self, name, expected):
+        if expected < 0:
+            with pytest.raises(PyLGTVCmdException, match=r'^Invalid JSON codec .+$'):
+                get_codec(name)
+        elif name in CODECS and CODECS[name][1] is None:
+            with pytest.raises(PyLGTVCmdException, match=r'^JSON codec .+ is not installed.$'):
+                get_codec(name)
+        else:
+            codec = get_codec(name)
+            msg = {"id": 1, "type": "request", "uri": "ssap://com.webos.service.apiadapter/audio/getVolume", "payload": {"a": "é"}}
+            # the standard library is the default, the fastest installed codec is opt-in
+            assert codec.name == {None: "json", "auto": available_codecs()[0]}.get(name, name)
+            assert codec.loads(codec.dumps(msg)) == msg
+
+
+
+    data_frame_cache = [
+        ( "request",    "audio/volumeUp",               {},                                                         1 ),
+        ( "request",    "externalpq/setExternalPqData", {"command": "PATTERN_WINDOW", "fillR": 1023, "winId": -1},  1 ),
+        ( "request",    "system/getSystemSettings",     {"category": "picture", "value": True, "f": 0.5, "n": None}, 1 ),
+        ( "subscribe",  "audio/getVolume",              {"text": "100% \"quoted\" é"},                            1 ),
+        ( "request",    "system/getSystemSettings",     {"category": "picture", "keys": ["contrast"]},              0 ),
+        ( "request",    "system/getSystemSettings",     {"category": "picture", "keys": ("contrast",)},             0 ),
+        ( "request",    "externalpq/setExternalPqData", {"command": "BT709_3D_LUT_DATA", "data": "A" * 65},         0 ),
+    ]
+
+    @pytest.mark.parametrize("request_type,uri,payload,expected", data_frame_cache)
+    @pytest.mark.parametrize("name", ["json", "orjson"])
+    async def test_frame_cache(self, name, request_type, uri, payload, expected):
+        if CODECS[name][1] is None:
+            pytest.skip(f"{name} is not installed")
+        codec = get_codec(name)
+        cache = FrameCache(codec.dumps, maxsize=1)
+
+        for uid in [1, 12345]:
+            frame = cache.frame(request_type, uri, payload, uid)
+            if expected == 0:
+                assert frame is None
+            else:
+                assert codec.loads(frame) == {"id": uid, "type": request_type, "uri": f"ssap://{uri}", "payload": payload}
+        assert len(cache) == expected
+
+        cache.frame("request", "audio/volumeDown", {}, 2)
+        assert len(cache) == 1
+
+        cache = FrameCache(codec.dumps)
+        for first, second in [(True, 1.0), (False, 0.0), (1.0, True)]:
+            cache.frame("request", "settings/setSystemSettings", {"enable": first}, 3)
+            frame = cache.frame("request", "settings/setSystemSettings", {"enable": second}, 4)
+            assert type(codec.loads(frame)["payload"]["enable"]) is type(second)
+
+
+
+    async def test_metrics(self):
+        histogram = Histogram(buckets=(0.1, 1))
+        for value in [0.05, 0.1, 0.5, 2]:
+            histogram.observe(value)
+        assert histogram.cumulative() == [(0.1, 2), (1, 3), (float("inf"), 4)]
+
+        metrics = ClientMetrics(labels={"host": 'tv "1"'}, buckets=(0.1, 1))
+        metrics.request_sent("audio/getVolume", 100)
+        metrics.response_received("audio/getVolume", 0.05, 200)
+        metrics.request_sent("tv/getExternalInputList", 100)
+        metrics.response_received("tv/getExternalInputList", 0.5, 50, error="404")
+        metrics.request_failed("tv/getExternalInputList", "timeout")
+        metrics.subscription_message("audio/getVolume", 30)
+        metrics.ping_rtt(0.01)
+        metrics.reconnected()
+
+        assert metrics.uris["audio/getVolume"].bytes_in == 230
+        assert metrics.uris["tv/getExternalInputList"].errors == {"404": 1, "timeout": 1}
+        assert set(metrics.message_rates()) == {"audio/getVolume"}
+
+        text = render_openmetrics([metrics])
+        assert text.endswith("# EOF\n")
+        assert 'bscpylgtv_requests_total{host="tv \\"1\\"",uri="audio/getVolume"} 1' in text
+        assert 'bscpylgtv_request_errors_total{host="tv \\"1\\"",uri="tv/getExternalInputList",error="timeout"} 1' in text
+        assert 'bscpylgtv_request_duration_seconds_bucket{host="tv \\"1\\"",uri="audio/getVolume",le="0.1"} 1' in text
+        assert 'bscpylgtv_ping_rtt_seconds_count{host="tv \\"1\\""} 1' in text
+        assert 'bscpylgtv_reconnects_total{host="tv \\"1\\""} 1' in text
+
+
+
+    @pytest.mark.parametrize("tags,expected", [
+        ( False,    ["bscpylgtv.192_168_1_18.requests.audio_getVolume:1|c", "bscpylgtv.192_168_1_18.request.audio_getVolume:12.5|ms"] ),
+        ( True,     ["bscpylgtv.requests:1|c|#host:192.168.1.18,uri:audio/getVolume", "bscpylgtv.request:12.5|ms|#host:192.168.1.18,uri:audio/getVolume"] ),
+    ])
+    async def test_statsd_sink(self, tags, expected):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(1)
+        sink = StatsdSink(port=receiver.getsockname()[1], tags=tags)
+        metrics = ClientMetrics(labels={"host": "192.168.1.18"}, sink=sink)
+
+        metrics.request_sent("audio/getVolume", 100)
+        metrics.response_received("audio/getVolume", 0.0125, 200)
+        lines = [receiver.recv(1024).decode() for _ in range(2)]
+        sink.close()
+        receiver.close()
+
+        assert lines == expected
+
+
+
+    async def test_settings_snapshot(self, tmp_path, capsys):
+        bulk = {
+            "settings": {"picture": {"backlight": "80", "contrast": "85"}, "option": {"country": "HUN"}},
+            "configs": {"tv.model.serial": "X", "tv.hw.panelType": "OLED"},
+            "errors": {"sound": "Request failed", "dimension.3d": "Request failed"},
+            "config_errors": {"tv.nyx.*": "Request failed"},
+        }
+        baseline = SettingsSnapshot.from_bulk(bulk, "192.168.1.18")
+        assert set(baseline.categories) == {"picture", "option", "config:tv.model", "config:tv.hw"}
+        assert baseline.errors == {
+            "sound": "Request failed", "dimension.3d": "Request failed", "config:tv.nyx": "Request failed"
+        }
+        assert baseline.hashes["picture"] == category_hash({"contrast": "85", "backlight": "80"})
+
+        other = SettingsSnapshot({
+            "picture": {"backlight": "60", "contrast": "85", "color": "50"},
+            "option": {"country": "HUN"},
+            "config:tv.model": {},
+            "sound": {"soundMode": "standard"},
+        })
+        assert baseline.diff(baseline) == {}
+        assert baseline.diff(other) == {
+            "picture": {"added": {"color": "50"}, "changed": {"backlight": ["80", "60"]}},
+            "config:tv.model": {"removed": {"tv.model.serial": "X"}},
+            "config:tv.hw": {"removed": {"tv.hw.panelType": "OLED"}},
+        }
+
+        baseline_file = tmp_path / "baseline.json"
+        other_file = tmp_path / "other.json"
+        baseline.save(baseline_file)
+        other.save(other_file)
+        assert SettingsSnapshot.load(baseline_file) == baseline
+
+        args = argparse.Namespace(action="diff", baseline=str(baseline_file), targets=[str(baseline_file), str(other_file)])
+        assert await snapshot_runloop(args) == 1
+        diffs = json.loads(capsys.readouterr().out)
+        assert diffs == {str(baseline_file): {}, str(other_file): baseline.diff(other)}
+
+
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+    async def test_merge_default_settings(self, tmp_path, chunk_size):
+        dump = """
+            {"category": "picture$hdmi1.expert2.2d.sdr", "value": {"backlight": "80", "contrast": "85"}}
+            {"category": "picture$hdmi2.expert2.2d.sdr", "value": {"backlight": "10", "sharpness": "10"}}
+            {"category": "picture$hdmi1.expert2.2d.hdr", "value": {"backlight": "100", "gamma": "high2"}}
+            {"category": "option", "value": {"country": "HUN", "audioGuidance": "off"}} 12345
+            {"category": "aiPicture$hdmi1.expert2.2d.sdr", "value": {"ai_Picture": "off"}}
+            [1, 2]  {"category": "option$dtv", "value": {"country": "DEU", "zipcode": "not_defined"}}
+        """
+        expected = {
+            "picture": {"backlight": "80", "contrast": "85", "gamma": "high2"},
+            "option": {"country": "HUN", "audioGuidance": "off", "zipcode": "not_defined"},
+            "aiPicture": {"ai_Picture": "off"},
+        }
+        assert merge_default_settings(io.StringIO(dump), chunk_size=chunk_size) == expected
+        assert merge_default_settings(io.StringIO(dump), ["option"], chunk_size=chunk_size) == {"option": expected["option"]}
+        assert list(iter_stacked_json(io.StringIO(" 1 22 333"), chunk_size)) == [1, 22, 333]
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_stacked_json(io.StringIO('{"a": 1} {"b": '), chunk_size))
+
+        (tmp_path / "defaultSettings-C2.json").write_text(dump)
+        written = merge_settings_files([str(tmp_path / "defaultSettings-C2.json")], ["picture", "other"], str(tmp_path))
+        assert written == [str(tmp_path / "picture-C2.json")]
+        assert json.loads((tmp_path / "picture-C2.json").read_text()) == expected["picture"]
+
@@ -0,0 +1,868 @@
+import asyncio
+import base64
+import json
+import numpy as np
+import pytest
+from bscpylgtv import WebOsClient, WebOsFleet
+from bscpylgtv import webos_client
+from bscpylgtv.webos_client import request_deadline
+from bscpylgtv import endpoints as ep
+from bscpylgtv import cal_commands as cal
+from bscpylgtv.codec import available_codecs
+from bscpylgtv.constants import SYSTEM_SETTINGS_KEYS
+from bscpylgtv.exceptions import PyLGTVCmdException, PyLGTVRequestTimeoutError, PyLGTVServiceNotFoundError
+from bscpylgtv.lut_tools import unity_lut_1d, unity_lut_3d
+from bscpylgtv.metrics import render_openmetrics, start_openmetrics_server
+from bscpylgtv.mock_server import MockWebOsServer
+from bscpylgtv.snapshot import SettingsSnapshot
+
+
+async def create_client(server, **kwargs):
+    kwargs.setdefault("ping_interval", None)
+    client = await WebOsClient.create(server.host, without_ssl=True, client_key=server.client_key, **kwargs)
+    client.port = server.port
+    return client
+
+
+@pytest.mark.asyncio
+class TestWebOsClientMock():
+
+    async def test_connect_states(self):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, get_hello_info=True)
+            await client.connect()
+
+            assert client.power_state == {"state": "Active"}
+            assert client.current_appId == "com.webos.app.hdmi1"
+            assert client.volume == 10
+            assert client.muted is False
+            assert client.sound_output == "tv_speaker"
+            assert "netflix" in client.apps
+            assert "com.webos.app.hdmi2" in client.inputs
+            assert client.software_info["model_name"] == "HE_DTV_W23O_AFABATAA"
+            assert client.hello_info["deviceUUID"] == "mock-device-uuid"
+
+            await client.disconnect()
+            assert not client.is_connected()
+
+
+
+    async def test_pairing(self, tmp_path):
+        async with MockWebOsServer() as server:
+            client = await WebOsClient.create(
+                server.host, without_ssl=True, ping_interval=None, states=[], key_file_path=str(tmp_path / "keys.sqlite")
+            )
+            client.port = server.port
+            await client.connect()
+
+            assert client.client_key == server.client_key
+            assert await client.storage.get_key(server.host) == server.client_key
+
+            await client.disconnect()
+
+
+
+    @pytest.mark.parametrize("json_codec", available_codecs())
+    async def test_json_codec(self, json_codec):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=["volume", "apps"], get_hello_info=True, json_codec=json_codec)
+            await client.connect()
+
+            assert client.codec.name == json_codec
+            assert client.hello_info["deviceUUID"] == "mock-device-uuid"
+            assert "netflix" in client.apps
+            res = await client.request(ep.GET_SYSTEM_SETTINGS, {"category": "picture", "keys": ["contrast"]})
+            assert res["settings"] == {"contrast": "85"}
+            assert server.received[-1]["uri"] == f"ssap://{ep.GET_SYSTEM_SETTINGS}"
+
+            await client.disconnect()
+
+
+
+    @pytest.mark.parametrize("frame_cache", [False, True])
+    async def test_frame_cache(self, frame_cache):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=[], frame_cache=frame_cache, calibration_info={"lut3d": "33pt"})
+            assert client.codec.name == "json"
+            await client.connect()
+
+            for _ in range(2):
+                await client.volume_up()
+                assert server.received[-1] == {"id": client.command_count - 1, "type": "request", "uri": f"ssap://{ep.VOLUME_UP}", "payload": {}}
+            res = await client.request(ep.GET_SYSTEM_SETTINGS, {"category": "picture", "keys": ["contrast"]})
+            assert res["settings"] == {"contrast": "85"}
+            assert len(client.frame_cache or []) == (1 if frame_cache else 0)
+
+            if frame_cache:
+                # the base64 data of calibration uploads never repeats, it isn't kept in templates
+                client.frame_cache.clear()
+                await client.upload_3d_lut_bt709()
+                await client.upload_1d_lut()
+                assert client.frame_cache.templates == {}
+
+            await client.disconnect()
+
+
+
+    data_request = [
+        ( ep.GET_POWER_STATE,       None,                               {"returnValue": True, "state": "Active"},   1 ),
+        ( ep.GET_SYSTEM_SETTINGS,   {"category": "picture", "keys": ["contrast"]},
+                                    {"returnValue": True, "category": "picture", "settings": {"contrast": "85"}},   1 ),
+        ( ep.GET_CALIBRATION,       {"command": "GET_1D_DPG_DATA"},     None,                                       0 ),
+        ( ep.SET_3D_ON,             None,                               None,                                       -1 ),
+    ]
+
+    @pytest.mark.parametrize("uri,payload,response,expected", data_request)
+    async def test_request(self, uri, payload, response, expected):
+        async with MockWebOsServer() as server:
+            server.set_error(ep.SET_3D_ON)
+            client = await create_client(server, states=[])
+            await client.connect()
+
+            if expected > 0:
+                assert response == await client.request(uri, payload)
+            elif expected == 0:
+                with pytest.raises(PyLGTVCmdException, match=r'^Invalid request response .+$'):
+                    await client.request(uri, payload)
+            else:
+                with pytest.raises(PyLGTVServiceNotFoundError):
+                    await client.request(uri, payload)
+
+            await client.disconnect()
+
+
+
+    async def test_subscription_push(self):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=["volume"])
+            await client.connect()
+
+            await server.push(ep.GET_VOLUME, {"volumeStatus": {"volume": 33}})
+            await client.request(ep.GET_POWER_STATE)
+
+            assert client.volume == 33
+
+            await client.disconnect()
+
+
+
+    async def test_input_command(self):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=[])
+            await client.connect()
+
+            await client.button("HOME")
+            await client.move(10, -5)
+            await client.disconnect()
+
+            assert server.input_messages == ["type:button\nname:HOME\n\n", "type:move\ndx:10\ndy:-5\ndown:0\n\n"]
+
+
+
+    async def test_input_batch(self):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=[])
+            with pytest.raises(PyLGTVCmdException, match=r"^Not connected, can't execute command.$"):
+                await client.button("HOME")
+            await client.connect()
+
+            with pytest.raises(ValueError, match=r"^button FOO is not valid"):
+                await client.send_buttons(["HOME", "FOO"])
+            assert client.input_connection is None
+
+            await client.send_buttons(["DOWN"] * 50)
+            inputws = client.input_connection
+            await inputws.close()
+            await client.move_path([(1, 2), (3, 4, 1)], delay=0.01)
+            assert client.input_connection is not inputws
+            await client.disconnect()
+
+            assert server.input_messages == ["type:button\nname:DOWN\n\n"] * 50 + [
+                "type:move\ndx:1\ndy:2\ndown:0\n\n", "type:move\ndx:3\ndy:4\ndown:1\n\n"
+            ]
+
+
+
+    async def test_input_socket_dead_ping(self, monkeypatch):
+        monkeypatch.setattr(webos_client, "PING_TIMEOUT_MIN", 0.01)
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=["power"], ping_interval=0.01, ping_timeout=0.1)
+            await client.connect()
+
+            await client.send_buttons(["HOME"])
+            inputws = client.input_connection
+
+            # the TV stops answering the pings of the input socket, it's closed and dropped
+            async def lost_ping(*args):
+                return asyncio.get_running_loop().create_future()
+
+            monkeypatch.setattr(inputws, "ping", lost_ping)
+            for _ in range(100):
+                if client.input_connection is None:
+                    break
+                await asyncio.sleep(0.01)
+            assert client.input_connection is None
+            assert inputws.state.name != "OPEN"
+
+            await client.send_buttons(["BACK"])
+            assert client.input_connection is not None
+            assert client.input_connection is not inputws
+            await client.disconnect()
+
+            assert server.input_messages == ["type:button\nname:HOME\n\n", "type:button\nname:BACK\n\n"]
+
+
+
+    async def test_pointer_stream(self):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=[])
+            await client.connect()
+
+            async with client.pointer_stream(rate=20) as stream:
+                stream.move(1, 1)
+                await asyncio.sleep(0.01)
+                for _ in range(10):
+                    stream.move(1, -1)
+                stream.scroll(0, 2)
+                stream.scroll(0, 3)
+                stream.move(1, 0, down=1)
+                stream.move(1, 0, down=1)
+                stream.click()
+            assert stream.stats == {"samples": 16, "merged": 11, "frames": 5, "dropped": 0}
+
+            await client.disconnect()
+            assert server.input_messages == [
+                "type:move\ndx:1\ndy:1\ndown:0\n\n", "type:move\ndx:10\ndy:-10\ndown:0\n\n",
+                "type:scroll\ndx:0\ndy:5\n\n", "type:move\ndx:2\ndy:0\ndown:1\n\n", "type:click\n\n",
+            ]
+
+            stream.move(1, 1)
+            await stream.flush()
+            assert stream.stats["dropped"] == 1
+            assert isinstance(stream.last_error, PyLGTVCmdException)
+
+
+
+    async def test_bootstrap_wave(self):
+        async with MockWebOsServer(latency=0.05) as server:
+            states = ["system_info", "software_info", "power", "current_app", "muted", "volume", "apps", "inputs", "sound_output"]
+            client = await create_client(server, states=states)
+            await client.connect()
+
+            assert client.connect_stats["bootstrap"] < 0.2
+            assert client.connect_stats["ready"] >= client.connect_stats["bootstrap"]
+            assert client.system_info is not None and client.software_info is not None
+            assert client.current_appId == "com.webos.app.hdmi1"
+            assert client.channels == []
+            uris = [msg["uri"] for msg in server.received if msg["type"] == "subscribe"]
+            assert uris.count(f"ssap://{ep.GET_TV_CHANNELS}") == 1
+
+            await client.disconnect()
+
+
+
+    async def test_metrics(self):
+        async with MockWebOsServer() as server:
+            server.set_error(ep.SET_3D_ON)
+            server.ignored_uris.add(ep.POWER_OFF)
+            client = await create_client(server, states=["volume"], metrics=True, timeout_request=0.05)
+            await client.connect()
+
+            await client.request(ep.GET_POWER_STATE)
+            with pytest.raises(PyLGTVServiceNotFoundError):
+                await client.request(ep.SET_3D_ON)
+            with pytest.raises(PyLGTVRequestTimeoutError):
+                await client.request(ep.POWER_OFF)
+            await server.push(ep.GET_VOLUME, {"volumeStatus": {"volume": 20}})
+            await client.request(ep.GET_POWER_STATE)
+
+            metrics = client.metrics
+            assert metrics.labels == {"host": server.host}
+            assert metrics.connect.count == 1
+            assert metrics.uris[ep.GET_POWER_STATE].requests == 2
+            assert metrics.uris[ep.GET_POWER_STATE].latency.count == 2
+            assert metrics.uris[ep.GET_POWER_STATE].bytes_out > 0 and metrics.uris[ep.GET_POWER_STATE].bytes_in > 0
+            assert metrics.uris[ep.SET_3D_ON].errors == {"404": 1}
+            assert metrics.uris[ep.POWER_OFF].errors == {"timeout": 1}
+            assert metrics.uris[ep.GET_VOLUME].responses == 1 and metrics.uris[ep.GET_VOLUME].messages == 1
+            assert client._metrics_pending == {}
+
+            exporter = await start_openmetrics_server(metrics, host="127.0.0.1", port=0)
+            reader, writer = await asyncio.open_connection("127.0.0.1", exporter.sockets[0].getsockname()[1])
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            response = (await reader.read()).decode()
+            writer.close()
+            exporter.close()
+            await exporter.wait_closed()
+
+            assert response.startswith("HTTP/1.1 200 OK")
+            assert response.endswith(render_openmetrics(metrics))
+
+            await client.disconnect()
+
+
+
+    async def test_adaptive_ping(self, monkeypatch):
+        monkeypatch.setattr(webos_client, "PING_TIMEOUT_MIN", 0.01)
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=["power"], ping_interval=0.01, ping_interval_max=0.08)
+            await client.connect()
+            ws = client.connection
+            pings = []
+            ws_ping = ws.ping
+
+            async def ping(*args):
+                pings.append(asyncio.get_running_loop().time())
+                return await ws_ping(*args)
+
+            monkeypatch.setattr(ws, "ping", ping)
+
+            # idle: the interval grows while the pongs arrive
+            await asyncio.sleep(0.5)
+            assert client.ping_rtt is not None
+            assert 3 <= len(pings) < 15
+
+            # traffic: inbound frames prove liveness, no pings needed
+            pings.clear()
+            end = asyncio.get_running_loop().time() + 0.3
+            while asyncio.get_running_loop().time() < end:
+                await client.request(ep.GET_POWER_STATE)
+                await asyncio.sleep(0.005)
+            assert len(pings) <= 1
+
+            # dead: unanswered pings close the connection after PING_MAX_MISSES
+            async def lost_ping(*args):
+                pings.append(asyncio.get_running_loop().time())
+                return asyncio.get_running_loop().create_future()
+
+            monkeypatch.setattr(ws, "ping", lost_ping)
+            pings.clear()
+            await asyncio.wait_for(asyncio.shield(client.connect_task), 2)
+            assert len(pings) == webos_client.PING_MAX_MISSES
+            assert not client.is_connected()
+
+
+
+    @pytest.mark.parametrize("pipelined", [False, True])
+    async def test_settings_transaction(self, pipelined):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=[])
+            await client.connect()
+
+            async with client.settings_transaction(pipelined=pipelined) as tx:
+                assert await client.set_current_picture_settings({"backlight": "80", "contrast": "80"}) is None
+                await client.set_other_settings({"whiteStabilizer": 13})
+                await client.set_current_picture_settings({"contrast": "85"})
+                await client.set_configs({"tv.model.motionProMode": "OLED Motion"})
+                await client.set_configs({"tv.model.motionProMode": "OLED Motion Pro"})
+                await client.set_device_info("HDMI_1", "pc", "PC")
+                await client.set_device_info("HDMI_2", "pc", "PC")
+                await client.set_current_picture_mode("expert1")
+                await client.set_current_picture_settings({"backlight": "50"})
+                assert server.luna_calls == []
+
+            assert tx.writes == 9
+            assert tx.alerts == 7
+            assert len(tx.results) == 7
+            assert server.luna_calls == [
+                (ep.LUNA_SET_SYSTEM_SETTINGS, {"category": "picture", "settings": {"backlight": "80", "contrast": "85"}}),
+                (ep.LUNA_SET_SYSTEM_SETTINGS, {"category": "other", "settings": {"whiteStabilizer": 13}}),
+                (ep.LUNA_SET_CONFIGS, {"configs": {"tv.model.motionProMode": "OLED Motion Pro"}}),
+                (ep.LUNA_SET_DEVICE_INFO, {"id": "HDMI_1", "icon": "pc.png", "label": "PC"}),
+                (ep.LUNA_SET_DEVICE_INFO, {"id": "HDMI_2", "icon": "pc.png", "label": "PC"}),
+                (ep.LUNA_SET_SYSTEM_SETTINGS, {"category": "picture", "settings": {"pictureMode": "expert1"}}),
+                (ep.LUNA_SET_SYSTEM_SETTINGS, {"category": "picture", "settings": {"backlight": "50"}}),
+            ]
+            assert server.settings["picture"]["backlight"] == "50"
+            assert server.alerts == {}
+
+            # outside of the block writes are sent right away
+            await client.set_other_settings({"whiteStabilizer": 10})
+            assert server.luna_calls[-1] == (ep.LUNA_SET_SYSTEM_SETTINGS, {"category": "other", "settings": {"whiteStabilizer": 10}})
+
+            await client.disconnect()
+
+
+
+    async def test_luna_requests_partial_failure(self):
+        async with MockWebOsServer() as server:
+            def create_alert(msg):
+                payload = msg["payload"]
+                if payload["onclose"]["params"].get("settings") == {"whiteStabilizer": 13}:
+                    return {"returnValue": False, "errorText": "failed"}
+                alert_id = f"alert-{len(server.alerts)}"
+                server.alerts[alert_id] = payload["onclose"]
+                return {"alertId": alert_id}
+
+            server.responses[ep.CREATE_ALERT] = create_alert
+            client = await create_client(server, states=[])
+            await client.connect()
+
+            calls = [
+                (ep.LUNA_SET_SYSTEM_SETTINGS, {"category": "picture", "settings": {"backlight": "60"}}),
+                (ep.LUNA_SET_SYSTEM_SETTINGS, {"category": "other", "settings": {"whiteStabilizer": 13}}),
+                (ep.LUNA_SET_DEVICE_INFO, {"id": "HDMI_1", "icon": "pc.png", "label": "PC"}),
+            ]
+            with pytest.raises(PyLGTVCmdException, match="failed"):
+                await client.luna_requests(calls)
+            # the created alerts are closed, none is left open on the TV
+            assert server.alerts == {}
+            assert server.luna_calls == [calls[0], calls[2]]
+
+            server.responses[ep.CREATE_ALERT] = {}
+            with pytest.raises(PyLGTVCmdException, match="Invalid alertId"):
+                await client.luna_requests(calls[:1])
+
+            await client.disconnect()
+
+
+
+    async def test_settings_cache(self):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=["picture_settings"])
+            await client.connect()
+            cache = client.settings_cache
+            assert cache.get("picture", "contrast") == "85"
+
+            # seeded by the picture_settings subscription, no write needed
+            assert await client.apply_settings("picture", {"contrast": 85, "backlight": "80"}) == {}
+            assert server.luna_calls == []
+            assert cache.stats == {"hits": 2, "misses": 0, "fetches": 0, "writes": 0}
+
+            # unknown keys are fetched once, only the differing ones are written
+            assert await client.apply_settings("option", {"audioGuidance": "on", "country": "HUN"}) == {"audioGuidance": "on", "country": "HUN"}
+            assert await client.apply_settings("option", {"audioGuidance": "on", "country": "HUN"}) == {}
+            assert server.luna_calls == [(ep.LUNA_SET_SYSTEM_SETTINGS, {"category": "option", "settings": {"audioGuidance": "on", "country": "HUN"}})]
+            assert cache.stats == {"hits": 4, "misses": 2, "fetches": 1, "writes": 1}
+
+            # kept current by the subscription
+            await server.push(ep.GET_SYSTEM_SETTINGS, {"category": "picture", "settings": {"contrast": "90"}})
+            await client.request(ep.GET_POWER_STATE)
+            await asyncio.sleep(0.05)
+            assert await client.apply_settings("picture", {"contrast": "85"}) == {"contrast": "85"}
+
+            # a picture mode change invalidates the values of the category
+            await client.apply_settings("picture", {"pictureMode": "expert1"})
+            assert cache.get("picture", "contrast") is None
+
+            async with client.settings_transaction() as tx:
+                await client.apply_settings("option", {"audioGuidance": "off"})
+                await client.apply_settings("option", {"audioGuidance": "off"})
+            assert tx.writes == 1
+
+            # writes of the other setters are followed as well
+            await client.apply_settings("picture", {"backlight": "80"})
+            await client.set_current_picture_settings({"backlight": "50"})
+            assert cache.get("picture", "backlight") == "50"
+            assert await client.apply_settings("picture", {"backlight": "80"}) == {"backlight": "80"}
+            await client.set_picture_mode("cinema", "hdmi2")
+            assert cache.get("picture", "backlight") is None
+            server.set_error(ep.CLOSE_ALERT)
+            with pytest.raises(PyLGTVCmdException):
+                await client.set_option_settings({"audioGuidance": "on"})
+            assert cache.get("option", "audioGuidance") is None
+            server.errors.clear()
+
+            # values not kept up to date by a subscription expire
+            fetches = cache.stats["fetches"]
+            await client.apply_settings("option", {"audioGuidance": "off"})
+            await client.apply_settings("option", {"audioGuidance": "off"})
+            cache.max_age = 0
+            await client.apply_settings("option", {"audioGuidance": "off"})
+            assert cache.stats["fetches"] == fetches + 2
+
+            await client.disconnect()
+            assert cache.categories == {}
+
+
+
+    async def test_system_settings_bulk(self):
+        def settings(msg):
+            category = msg["payload"]["category"]
+            if category == "lock":
+                return {"returnValue": False, "errorText": "not supported"}
+            return {"category": category, "settings": {key: "1" for key in msg["payload"]["keys"]}}
+
+        async with MockWebOsServer(latency=0.02, responses={ep.GET_SYSTEM_SETTINGS: settings}) as server:
+            server.configs.update({"tv.model.serial": "X", "tv.hw.panelType": "OLED", "tv.nyx.platform": "O20"})
+            client = await create_client(server, states=[])
+            await client.connect()
+
+            in_flight = peak = 0
+            request = client.request
+
+            async def counting_request(*args, **kwargs):
+                nonlocal in_flight, peak
+                in_flight += 1
+                peak = max(peak, in_flight)
+                try:
+                    return await request(*args, **kwargs)
+                finally:
+                    in_flight -= 1
+
+            client.request = counting_request
+            res = await client.get_system_settings_bulk(configs=["tv.model.*", "tv.hw.*"], max_concurrent=3)
+            assert peak == 3
+            assert set(res["settings"]) == set(SYSTEM_SETTINGS_KEYS) - {"lock"}
+            assert res["settings"]["time"] == {"onTimerVolume": "1", "timeZone": "1"}
+            assert res["configs"] == {"tv.model.serial": "X", "tv.hw.panelType": "OLED"}
+            assert list(res["errors"]) == ["lock"]
+            assert res["config_errors"] == {}
+
+            res = await client.get_system_settings_bulk({"option": ["country"]}, jsonOutput=True)
+            assert json.loads(res) == {"settings": {"option": {"country": "1"}}, "configs": {}, "errors": {}, "config_errors": {}}
+
+            server.set_error(ep.GET_CONFIGS)
+            res = await client.get_system_settings_bulk({"option": ["country"]}, configs=["tv.model.*"])
+            assert res["errors"] == {}
+            assert list(res["config_errors"]) == ["tv.model.*"]
+
+            with pytest.raises(ValueError):
+                await client.get_system_settings_bulk(max_concurrent=0)
+            await client.disconnect()
+
+
+
+    async def test_settings_snapshot(self):
+        async with MockWebOsServer() as server:
+            server.configs.update({"tv.model.serial": "X"})
+            client = await create_client(server, states=[])
+            await client.connect()
+            baseline = await SettingsSnapshot.capture(client, configs=["tv.model.*"])
+            assert baseline.categories["picture"] == {"backlight": "80", "brightness": "50", "color": "50", "contrast": "85"}
+            assert baseline.categories["config:tv.model"] == {"tv.model.serial": "X"}
+
+            server.settings["picture"]["backlight"] = "60"
+            snapshot = await SettingsSnapshot.capture(client, configs=["tv.model.*"])
+            assert baseline.diff(snapshot) == {"picture": {"changed": {"backlight": ["80", "60"]}}}
+            await client.disconnect()
+
+
+
+    async def test_request_many(self):
+        async with MockWebOsServer(latency=0.05) as server:
+            server.set_error(ep.SET_3D_ON)
+            client = await create_client(server, states=[])
+            await client.connect()
+
+            requests = [ep.GET_POWER_STATE] * 20 + [(ep.SET_3D_ON, None), (ep.GET_SYSTEM_SETTINGS, {"category": "option", "keys": ["audioGuidance"]})]
+            start = asyncio.get_running_loop().time()
+            res = await client.request_many(requests)
+            elapsed = asyncio.get_running_loop().time() - start
+
+            assert elapsed < 0.5
+            assert len(res) == 22
+            assert res[0] == {"returnValue": True, "state": "Active"}
+            assert isinstance(res[20], PyLGTVServiceNotFoundError)
+            assert res[21]["settings"] == {"audioGuidance": "off"}
+            assert client.futures == {}
+
+            with pytest.raises(PyLGTVServiceNotFoundError):
+                await client.request_many(requests, return_exceptions=False)
+
+            await client.disconnect()
+
+
+
+    async def test_request_timeout(self):
+        async with MockWebOsServer() as server:
+            server.ignored_uris.add(ep.POWER_OFF)
+            client = await create_client(server, states=[], timeout_request=0.05)
+            await client.connect()
+
+            with pytest.raises(PyLGTVRequestTimeoutError, match=r'^Request \d+ timed out after 0.050 seconds.$'):
+                await client.request(ep.POWER_OFF)
+            assert client.futures == {}
+
+            with pytest.raises(PyLGTVRequestTimeoutError):
+                await client.subscribe(client.set_power_state, ep.POWER_OFF)
+            assert client.futures == {} and client.callbacks == {}
+
+            assert (await client.request(ep.GET_POWER_STATE, timeout=1))["state"] == "Active"
+
+            start = asyncio.get_running_loop().time()
+            with request_deadline(0.1):
+                res = await client.request_many([ep.GET_POWER_STATE, ep.POWER_OFF], timeout=1)
+                assert res[0]["state"] == "Active"
+                assert isinstance(res[1], PyLGTVRequestTimeoutError)
+                with pytest.raises(PyLGTVRequestTimeoutError, match=r'^Request \d+ not sent, deadline already expired.$'):
+                    await client.request(ep.GET_POWER_STATE)
+            assert asyncio.get_running_loop().time() - start < 0.5
+            assert client.futures == {}
+            assert server.received[-1]["uri"] == f"ssap://{ep.POWER_OFF}"
+
+            await client.disconnect()
+
+
+
+    async def test_pipeline(self):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=[])
+            await client.connect()
+
+            async with client.pipeline() as pipe:
+                first = pipe.request(ep.GET_POWER_STATE)
+                second = pipe.request(ep.GET_SOUND_OUTPUT)
+
+            assert pipe.results[first]["state"] == "Active"
+            assert pipe.results[second]["soundOutput"] == "tv_speaker"
+            assert [msg["uri"] for msg in server.received[-2:]] == [f"ssap://{ep.GET_POWER_STATE}", f"ssap://{ep.GET_SOUND_OUTPUT}"]
+
+            await client.disconnect()
+
+
+
+    async def test_fleet(self, tmp_path):
+        servers = [await MockWebOsServer.create(host=f"127.0.0.{i}", latency=0.1) for i in range(2, 6)]
+        servers[-1].ignored_uris.add(ep.GET_POWER_STATE)
+
+        fleet = await WebOsFleet.create(
+            [server.host for server in servers], key_file_path=str(tmp_path / "keys.sqlite"),
+            max_concurrent_connects=2, without_ssl=True, ssl_context=WebOsClient.create_ssl_context(),
+            ping_interval=None, states=[],
+        )
+        for server in servers:
+            fleet[server.host].port = server.port
+
+        res = await fleet.connect()
+        assert all(value is True for value in res.values())
+        for server in servers:
+            assert await fleet.storage.get_key(server.host) == server.client_key
+
+        start = asyncio.get_running_loop().time()
+        res = await fleet.execute("get_power_state", timeout=0.5)
+        elapsed = asyncio.get_running_loop().time() - start
+
+        assert elapsed < 0.8
+        assert [res[server.host] for server in servers[:-1]] == [{"returnValue": True, "state": "Active"}] * 3
+        assert isinstance(res[servers[-1].host], PyLGTVRequestTimeoutError)
+        assert fleet[servers[-1].host].futures == {}
+
+        res = await fleet.execute("get_sound_output", hosts=[servers[0].host])
+        assert res == {servers[0].host: "tv_speaker"}
+
+        # commands sent to a TV while it's still connecting wait for the same connection
+        await fleet.disconnect()
+        results = await asyncio.gather(*[fleet.execute("get_power_state", hosts=[servers[0].host]) for _ in range(2)])
+        assert [res[servers[0].host] for res in results] == [{"returnValue": True, "state": "Active"}] * 2
+
+        # a per-TV timeout doesn't cancel the connection attempt the other callers wait for
+        await fleet.disconnect()
+        hosts = [servers[0].host]
+        timed_out, res = await asyncio.gather(
+            fleet.execute("get_power_state", hosts=hosts, timeout=0.001), fleet.execute("get_power_state", hosts=hosts),
+        )
+        assert isinstance(timed_out[servers[0].host], PyLGTVRequestTimeoutError)
+        assert res[servers[0].host] == {"returnValue": True, "state": "Active"}
+
+        await fleet.disconnect()
+        for server in servers:
+            await server.stop()
+
+
+
+    async def test_auto_reconnect(self):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=["power", "volume"], auto_reconnect=True, reconnect_delay_min=0.01)
+            updates = []
+            pushed = []
+
+            async def on_update(client):
+                updates.append(client.volume)
+
+            async def on_sound_output(payload):
+                pushed.append(payload.get("soundOutput"))
+
+            async def wait_reconnect(count):
+                while client.reconnect_count < count:
+                    await asyncio.sleep(0.01)
+
+            await client.register_state_update_callback(on_update)
+            await client.connect()
+            await client.subscribe(on_sound_output, ep.GET_SOUND_OUTPUT)
+            assert updates == [10]
+
+            # unchanged state after reconnecting: the subscription is replayed, no callbacks
+            await server.disconnect_clients()
+            await asyncio.wait_for(wait_reconnect(1), 2)
+            assert client.is_connected()
+            assert updates == [10]
+            assert len(server.requests_for(ep.GET_SOUND_OUTPUT)) == 2
+            assert pushed == ["tv_speaker", "tv_speaker"]
+
+            # changed state after reconnecting
+            server.responses[ep.GET_VOLUME] = {"volumeStatus": {"volume": 20, "muteStatus": False}}
+            await server.disconnect_clients()
+            await asyncio.wait_for(wait_reconnect(2), 2)
+            assert updates == [10, 20]
+
+            await client.disconnect()
+            assert client.reconnect_task is None
+            assert not client.is_connected()
+            assert client.state_update_callbacks == []
+
+
+
+    data_state_update_delay = [
+        ( None, [{"volume"}] * 5 + [set()] ),
+        ( 0.05, [{"volume"}] ),
+    ]
+
+    @pytest.mark.parametrize("delay,expected", data_state_update_delay)
+    async def test_state_update_delay(self, delay, expected):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=["volume"], state_update_delay=delay)
+            updates = []
+
+            async def on_update(client):
+                updates.append(set(client.changed_states))
+
+            await client.connect()
+            await client.register_state_update_callback(on_update)
+            updates.clear()
+
+            for volume in range(11, 16):
+                await server.push(ep.GET_VOLUME, {"volumeStatus": {"volume": volume}})
+            # unchanged value, skipped by the coalescing dispatcher
+            await server.push(ep.GET_VOLUME, {"volumeStatus": {"volume": 15}})
+            await client.request(ep.GET_POWER_STATE)
+            await asyncio.sleep(0.1)
+
+            assert client.volume == 15
+            assert updates == expected
+
+            await client.disconnect()
+
+
+
+    data_subscription_queue = [
+        ( 0,    "block",        False ),
+        ( 1,    "block",        False ),
+        ( 2,    "drop_oldest",  True ),
+        ( 0,    "conflate",     True ),
+    ]
+
+    @pytest.mark.parametrize("queue_size,queue_policy,drops", data_subscription_queue)
+    async def test_subscription_queue(self, queue_size, queue_policy, drops):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=[])
+            await client.connect()
+            seen = []
+
+            async def on_volume(volume):
+                seen.append(volume)
+                await asyncio.sleep(0.02)
+
+            await client.subscribe(
+                lambda payload: on_volume(payload["volumeStatus"]["volume"]), ep.GET_VOLUME,
+                queue_size=queue_size, queue_policy=queue_policy,
+            )
+            for volume in range(11, 21):
+                await server.push(ep.GET_VOLUME, {"volumeStatus": {"volume": volume}})
+            await client.request(ep.GET_POWER_STATE)
+            await asyncio.sleep(0.3)
+
+            [stats] = client.subscription_stats().values()
+            assert seen[-1] == 20
+            assert stats["received"] == 11 and stats["depth"] == 0
+            assert stats["dropped"] == 11 - len(seen)
+            assert (stats["dropped"] > 0) == drops
+            if queue_size:
+                assert stats["max_depth"] <= queue_size
+
+            await client.disconnect()
+
+
+
+    async def test_conflate_states(self):
+        async with MockWebOsServer() as server:
+            client = await create_client(server, states=["volume", "apps"])
+            await client.connect()
+
+            policies = {stats["uri"]: stats["policy"] for stats in client.subscription_stats().values()}
+            assert policies == {ep.GET_VOLUME: "conflate", ep.GET_APPS: "drop_oldest"}
+            with pytest.raises(PyLGTVCmdException, match=r'^Invalid subscription queue policy foo, must be one of: .+$'):
+                await client.subscribe(client.set_volume_state, ep.GET_VOLUME, queue_policy="foo")
+            await client.disconnect()
+
+            client = await create_client(server, states=["volume"], conflate_states=False)
+            await client.connect()
+            assert [stats["policy"] for stats in client.subscription_stats().values()] == ["drop_oldest"]
+            await client.disconnect()
+
+            # block would stop the reader behind a callback waiting for a response
+            with pytest.raises(PyLGTVCmdException, match=r'^Invalid subscription queue policy block, must be one of: drop_oldest, conflate\.$'):
+                await create_client(server, subscription_queue_policy="block")
+
+
+
+    @pytest.mark.parametrize("conflate_states", [True, False])
+    async def test_subscription_callback_requests(self, conflate_states):
+        # the current app callback subscribes to the channels, which answer slowly and fail
+        async with MockWebOsServer(latency=lambda uri: 0.1 if uri == ep.GET_TV_CHANNELS else 0) as server:
+            server.set_error(ep.GET_TV_CHANNELS)
+            client = await create_client(
+                server, states=["current_app"], subscription_queue_size=1, conflate_states=conflate_states, timeout_request=2,
+            )
+            await client.connect()
+
+            for app in ["com.webos.app.hdmi1", "com.webos.app.hdmi2", "com.webos.app.hdmi3", "com.webos.app.hdmi4"]:
+                await server.push(ep.GET_CURRENT_APP_INFO, {"appId": app})
+            assert (await client.get_power_state())["returnValue"]
+            await asyncio.sleep(0.5)
+            assert client.current_appId == "com.webos.app.hdmi4"
+
+            await client.disconnect()
+
+
+
+    async def test_stream_calibration(self):
+        async with MockWebOsServer() as server:
+            for stream in [False, True]:
+                client = await create_client(server, states=[], calibration_info={"lut3d": "33pt"}, stream_calibration=stream)
+                await client.connect()
+                await client.upload_3d_lut_bt709()
+                await client.set_oled_light(40)
+                await client.disconnect()
+
+            plain, streamed = server.calibration_requests[:2], server.calibration_requests[2:]
+            assert streamed == plain
+            assert plain[0]["dataCount"] == 33 * 33 * 33 * 3
+            assert client.calibration_stats["encode"]["bytes"] == 2
+            assert client.calibration_stats["request"]["bytes"] > 0
+
+
+
+    async def test_calibration_snapshot(self, tmp_path):
+        async with MockWebOsServer() as server:
+            lut3d = unity_lut_3d(33)
+            server.set_calibration_data(cal.GET_1D_LUT, base64.b64encode(unity_lut_1d().tobytes()).decode(), 3072)
+            server.set_calibration_data(cal.GET_3D_LUT, base64.b64encode(lut3d.tobytes()).decode(), lut3d.size)
+            server.set_calibration_data(cal.GET_GAMMA_2_2_TRANSFORM, "AQA=", 1)
+            server.set_calibration_data(cal.GET_GAMMA_0_45_TRANSFORM, "AAA=", 1)
+            server.set_calibration_data(
+                cal.GET_3BY3_GAMUT_DATA, base64.b64encode(np.identity(3, dtype=np.float32).tobytes()).decode(), 9, "float"
+            )
+            client = await create_client(server, states=["software_info"])
+            await client.connect()
+
+            filename = str(tmp_path / "snapshot.npz")
+            data = await client.snapshot_calibration(filename)
+            assert sorted(data) == ["1d_en_0_45", "1d_en_2_2", "1d_lut", "3by3_gamut_data", "3d_lut"]
+            assert np.array_equal(data["3d_lut"], lut3d)
+
+            restored = await client.restore_calibration(filename, picture_mode="expert1", color_space="bt709")
+            assert restored == ["1d_lut", "1d_en_2_2", "1d_en_0_45", "3by3_gamut_data", "3d_lut"]
+            assert [payload["command"] for payload in server.calibration_requests] == [
+                cal.CAL_START, cal.UPLOAD_1D_LUT, cal.ENABLE_GAMMA_2_2_TRANSFORM, cal.ENABLE_GAMMA_0_45_TRANSFORM,
+                cal.BT709_3BY3_GAMUT_DATA, cal.UPLOAD_3D_LUT_BT709, cal.CAL_END,
+            ]
+            assert server.calibration_requests[2]["data"] == "AQA="
+            assert server.calibration_requests[5]["data"] == base64.b64encode(lut3d.tobytes()).decode()
+
+            with np.load(filename) as archive:
+                metadata = json.loads(str(archive["metadata"]))
+            assert metadata["chip_type"] == "W23O"
+            assert list(metadata["errors"]) == ["3by3_gamut_data_hdr"]
+
+            await client.disconnect()